@@ -0,0 +1,427 @@
+"""
+asgi.py
+ASGI entry point for the API.
+
+    uvicorn asgi:application --workers 2
+    hypercorn asgi:application --workers 2
+
+app.py is still a WSGI app, and `gunicorn app:app` keeps working. When it
+is served through this module instead, the hot anonymous reads
+(GET /api/articles and GET /api/articles/<id>) run as coroutines on an
+async database driver: asyncpg for postgresql:// URLs and aiosqlite for
+sqlite:/// ones. While one of these requests waits on the database it
+holds no thread. One process can then keep hundreds of feed requests in
+flight, where a sync worker holds a thread for each of them.
+
+Concurrency model, per process:
+  * One event loop runs the async reads. Their queries share an async pool
+    of ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW connections (default
+    10 + 10). Requests beyond that wait on the pool, not on threads.
+  * The event stream (/api/stream) is dispatched to the Flask view on the
+    loop, and its body is iterated with `async for` (stream.EventStream):
+    an open stream waits on the loop and holds no thread. At most
+    STREAM_MAX_SUBSCRIBERS are open per process.
+  * Everything else is handed to the Flask app on ASGI_WSGI_THREADS
+    threads (default 32), just as a gthread worker would run it, with the
+    sync engine and its pool. That covers writes, authenticated reads,
+    trending, collapsed stories, stats and login. Password hashing
+    already runs on its own pool (passwords.py).
+  * The few blocking calls the async reads make (the replica lag check,
+    loading the source directory) run on ASGI_HELPER_THREADS threads
+    (default 4) of their own, so a busy thread pool cannot stall them.
+    So does the rate limit check when its store blocks
+    (RATE_LIMIT_STORE=redis: a round trip per request); the memory store
+    only takes a lock and is checked on the loop with the other hooks.
+  * The async reads go through the same Flask before- and after-request
+    hooks (CORS, compression, profiling) as everything else, so their
+    responses are identical to the sync ones.
+
+If the async driver for the configured database is not installed, every
+request but the event stream takes the thread path. The module is therefore safe to deploy
+before the driver is.
+
+    ASGI_ASYNC_READS       default 1; 0 sends every request to the threads
+    ASGI_WSGI_THREADS      default 32
+    ASGI_HELPER_THREADS    default 4
+    ASYNC_DB_POOL_SIZE     default 10
+    ASYNC_DB_MAX_OVERFLOW  default 10
+
+benchmarks/serving_bench.py compares sync workers with this mode.
+"""
+
+import asyncio
+import importlib.util
+import io
+import logging
+import math
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from flask import jsonify, request
+from sqlalchemy import desc, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import selectinload
+from sqlalchemy.pool import NullPool
+
+import app as app_module
+from app import app, feed_filters
+from models import db, Article, parse_fields, source_cache, source_directory, vote_counts_query
+from database import pgbouncer_mode, replica_usable, statement_timeout_ms, REPLICA_BIND
+from ratelimit import ADMITTED
+from stream import EventStream
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DRIVERS = {'postgresql': ('postgresql+asyncpg', 'asyncpg'), 'sqlite': ('sqlite+aiosqlite', 'aiosqlite')}
+ARTICLE_PATH = re.compile(r'^/api/articles/(\d+)$')
+
+
+def async_url(url):
+    """The async-driver form of a database URL, or None if that driver is not installed"""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or importlib.util.find_spec(driver[1]) is None:
+        return None
+    return url.set(drivername=driver[0])
+
+
+def async_engine_options(url):
+    if url.get_backend_name() != 'postgresql':
+        return {}
+    if pgbouncer_mode():
+        # Transaction pooling cannot track asyncpg's prepared statements
+        return {'poolclass': NullPool, 'connect_args': {'statement_cache_size': 0, 'prepared_statement_cache_size': 0}}
+    options = {
+        'pool_size': int(os.environ.get('ASYNC_DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+    timeout = statement_timeout_ms()
+    if timeout:
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(timeout)}}
+    return options
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+def response_start(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    }
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def wait_for_disconnect(receive, disconnected):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    disconnected.set()
+
+
+async def ensure_sources(run_sync, source_ids):
+    """Reload the source directory on a helper thread if the articles name a source
+    it does not know yet, so that to_dict below only reads memory"""
+    directory = source_cache.get('directory')
+    missing = [i for i in source_ids if i is not None and (directory is None or i not in directory.names)]
+    if missing:
+        await run_sync(load_source_directory, missing[0])
+
+
+def load_source_directory(source_id=None):
+    with app.app_context():
+        source_directory(source_id)
+
+
+async def feed_articles(session, run_sync):
+    """Async port of get_articles for anonymous, unranked, uncollapsed pages"""
+    fields = parse_fields(request.args)
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    # Same fallbacks as Flask-SQLAlchemy's paginate(error_out=False)
+    page = page if page > 0 else 1
+    per_page = per_page if per_page > 0 else 20
+
+    query = select(Article).where(*feed_filters(request.args))
+    total = (await session.execute(select(func.count()).select_from(query.subquery()))).scalar()
+    articles = (await session.execute(
+        query.order_by(desc(Article.created_at)).limit(per_page).offset((page - 1) * per_page)
+    )).scalars().all()
+    counts = {}
+    if articles and (fields is None or fields & {'vote_stats', 'total_votes'}):
+        rows = await session.execute(vote_counts_query([a.id for a in articles]))
+        counts = {article_id: (int(biased or 0), int(votes)) for article_id, votes, biased in rows}
+    await ensure_sources(run_sync, {a.source_id for a in articles})
+    return jsonify({
+        'articles': [a.to_dict(fields=fields, vote_counts=counts.get(a.id, (0, 0))) for a in articles],
+        'pagination': {'total_pages': math.ceil(total / per_page) if total else 0, 'total_items': total}
+    }), 200
+
+
+async def article_detail(session, run_sync, article_id):
+    """Async port of get_article for anonymous requests"""
+    article = (await session.execute(
+        select(Article).where(Article.id == article_id).options(selectinload(Article.related_articles))
+    )).scalar_one_or_none()
+    if article is None:
+        return jsonify({'error': 'Article not found'}), 404
+    rows = (await session.execute(vote_counts_query([article_id]))).all()
+    counts = (int(rows[0][2] or 0), int(rows[0][1])) if rows else (0, 0)
+    await ensure_sources(run_sync, {article.source_id} | {ra.source_id for ra in article.related_articles})
+    return jsonify({'article': article.to_dict(include_related=True, vote_counts=counts)}), 200
+
+
+class Application:
+    """ASGI app: async handlers for the hot anonymous reads, Flask on threads for the rest"""
+
+    def __init__(self, wsgi_app, threads=32, helper_threads=4, async_reads=True):
+        self.wsgi_app = wsgi_app
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        self.helpers = ThreadPoolExecutor(max_workers=helper_threads, thread_name_prefix='asgi-helper')
+        self.async_reads = async_reads
+        self._sessions = None           # AsyncSession factory (primary)
+        self._replica_sessions = None
+        self._engines = []
+        self._started = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            app.wsgi_app,
+            threads=int(os.environ.get('ASGI_WSGI_THREADS', 32)),
+            helper_threads=int(os.environ.get('ASGI_HELPER_THREADS', 4)),
+            async_reads=os.environ.get('ASGI_ASYNC_READS', '1') != '0',
+        )
+
+    def startup(self):
+        if self._started:
+            return
+        self._started = True
+        if not self.async_reads:
+            return
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        if url is None:
+            logger.warning("No async driver for the database URL; serving every request on threads")
+            return
+        self._engines.append(create_async_engine(url, **async_engine_options(url)))
+        self._sessions = async_sessionmaker(self._engines[-1], expire_on_commit=False)
+        replica = os.environ.get('DATABASE_REPLICA_URL')
+        replica_url = async_url(replica) if replica else None
+        if replica_url is not None:
+            self._engines.append(create_async_engine(replica_url, **async_engine_options(replica_url)))
+            self._replica_sessions = async_sessionmaker(self._engines[-1], expire_on_commit=False)
+
+    async def shutdown(self):
+        for engine in self._engines:
+            await engine.dispose()
+        self.threads.shutdown(wait=False)
+        self.helpers.shutdown(wait=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            # No websockets: the live updates are server-sent events
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        self.startup()
+        body = await read_body(receive)
+        if body is None:
+            return
+        environ = build_environ(scope, body)
+        route = self._async_route(scope)
+        if scope['path'] == '/api/stream' and scope['method'] == 'GET' and app_module.stream_hub is not None:
+            await self._serve_stream(environ, receive, send)
+        elif route is None:
+            await self._serve_wsgi(environ, receive, send)
+        else:
+            handler, args = route
+            await self._serve_async(environ, send, handler, args)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _async_route(self, scope):
+        """(handler, args) when the request can be served asynchronously, else None"""
+        if self._sessions is None or scope['method'] != 'GET':
+            return None
+        if any(name == b'authorization' for name, _ in scope['headers']):
+            # Signed-in reads need the user's votes and bookmarks (and read-your-writes)
+            return None
+        if scope['path'] == '/api/articles':
+            query = parse_qs(scope['query_string'].decode('latin-1'))
+            if query.get('sort') == ['trending'] or query.get('collapse') == ['stories']:
+                return None
+            return feed_articles, ()
+        match = ARTICLE_PATH.match(scope['path'])
+        if match:
+            return article_detail, (int(match.group(1)),)
+        return None
+
+    async def _run_sync(self, fn, *args):
+        """Run a blocking helper of the async path on the helper threads"""
+        return await asyncio.get_running_loop().run_in_executor(self.helpers, fn, *args)
+
+    async def _run_wsgi(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.threads, fn, *args)
+
+    async def _session_factory(self):
+        """Anonymous reads go to the replica while it keeps up, like use_replica() does"""
+        if self._replica_sessions is not None:
+            if await self._run_sync(replica_usable, db.engines[REPLICA_BIND]):
+                return self._replica_sessions
+        return self._sessions
+
+    def _admit(self, limiter, environ):
+        with app.request_context(environ):
+            rv = limiter.admit()
+        if rv is None:
+            # The before_request hook then lets the request through without a second check
+            environ[ADMITTED] = True
+        return rv
+
+    async def _serve_async(self, environ, send, handler, args):
+        if source_cache.get('directory') is None:
+            # Loaded with the sync engine; after that to_dict and the filters only read memory
+            await self._run_sync(load_source_directory)
+        limiter = app.extensions.get('rate_limiter')
+        rejected = None
+        if limiter is not None and limiter.store.blocking:
+            rejected = await self._run_sync(self._admit, limiter, environ)
+        with app.request_context(environ):
+            try:
+                rv = rejected or app.preprocess_request()
+                if rv is None:
+                    async with (await self._session_factory())() as session:
+                        rv = await handler(session, self._run_sync, *args)
+            except Exception as e:
+                rv = jsonify({'error': str(e)}), 500
+            response = app.process_response(app.make_response(rv))
+        await send(response_start(response.status_code, response.headers.items()))
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def _serve_stream(self, environ, receive, send):
+        """The event stream on the loop. The view only subscribes to the hub, which takes
+        no I/O, so it runs here too; its EventStream body is iterated with `async for`."""
+        with app.request_context(environ):
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                response = app.make_response((jsonify({'error': str(e)}), 500))
+        body = response.response
+        if not isinstance(body, EventStream):
+            # Refused, e.g. 503 when the worker is full
+            await send(response_start(response.status_code, response.headers.items()))
+            await send({'type': 'http.response.body', 'body': response.get_data()})
+            return
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(wait_for_disconnect(receive, disconnected))
+        # Ends the stream's wait as soon as the client goes
+        watcher.add_done_callback(lambda _: body.close())
+        try:
+            await send(response_start(response.status_code, response.headers.items()))
+            async for chunk in body:
+                if not disconnected.is_set():
+                    await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+            if not disconnected.is_set():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            body.close()
+
+    async def _serve_wsgi(self, environ, receive, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+            return lambda data: None
+
+        def begin():
+            iterable = self.wsgi_app(environ, start_response)
+            chunks = iter(iterable)
+            return iterable, chunks, next(chunks, None)
+
+        iterable, chunks, chunk = await self._run_wsgi(begin)
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(wait_for_disconnect(receive, disconnected))
+        try:
+            await send(response_start(started['status'], started['headers']))
+            # Streamed responses yield chunk by chunk until the client goes
+            while chunk is not None and not disconnected.is_set():
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await self._run_wsgi(next, chunks, None)
+            if not disconnected.is_set():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            if hasattr(iterable, 'close'):
+                await self._run_wsgi(iterable.close)
+
+
+application = Application.from_env()
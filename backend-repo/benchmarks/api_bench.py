@@ -0,0 +1,271 @@
+"""
+api_bench.py
+Load generator for the NETRA API hot paths.
+
+Drives the feed, article detail, voting and every /api/stats/* endpoint
+with a pool of concurrent clients. For each scenario it reports p50/p95/p99
+latency and throughput, then writes the results as JSON so runs on
+different commits can be compared.
+
+Against a running server (gunicorn, app.py, asgi.py ...):
+    python benchmarks/api_bench.py --base-url http://localhost:5000
+
+In-process through Flask's test client, using DATABASE_URL:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/api_bench.py
+
+Compare with an earlier run; exits with status 1 on a regression:
+    python benchmarks/api_bench.py --compare benchmarks/results/<earlier>.json
+
+Voting scenarios log in as the bench_user_* accounts created by
+generate_corpus.py. All clients come from one address, so run the server
+with RATE_LIMIT_ENABLED=0 (the in-process mode does this unless the
+variable is set).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+STATS_ENDPOINTS = ['overview', 'voting', 'bookmarks', 'sources', 'categories', 'authors', 'engagement', 'all', 'timeseries']
+
+
+def build_scenarios(max_article_id, categories):
+    """Scenario name -> function(rng) returning (method, path, json_body, needs_auth)"""
+    scenarios = {
+        'feed': lambda rng: ('GET', f'/api/articles?page={rng.randint(1, 5)}', None, False),
+        'feed_category': lambda rng: ('GET', f'/api/articles?category={rng.choice(categories)}', None, False),
+        'feed_search': lambda rng: ('GET', '/api/articles?search=' + rng.choice(['election', 'cricket', 'market']), None, False),
+        'feed_authenticated': lambda rng: ('GET', '/api/articles', None, True),
+        'article': lambda rng: ('GET', f'/api/articles/{rng.randint(1, max_article_id)}', None, False),
+        'vote': lambda rng: ('POST', f'/api/articles/{rng.randint(1, max_article_id)}/vote',
+                             {'is_biased': rng.random() < 0.5}, True),
+    }
+    for name in STATS_ENDPOINTS:
+        scenarios[f'stats_{name}'] = (lambda path: lambda rng: ('GET', path, None, False))(f'/api/stats/{name}')
+    return scenarios
+
+
+class HTTPClient:
+    """Keep-alive HTTP client; one per worker thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.conn = conn_class(parts.hostname, parts.port, timeout=60)
+        self.prefix = parts.path.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.conn.request(method, self.prefix + path, body=data, headers=headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            raise
+        return response.status, payload
+
+
+class InProcessClient:
+    """Flask test client wrapper with the same interface as HTTPClient"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_data()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else 0,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1]) if latencies else 0,
+    }
+
+
+def run_scenario(make_client, make_request, tokens, concurrency, duration, warmup, seed):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    state = {}
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        client = make_client()
+        local, local_errors = [], 0
+        start_barrier.wait()
+        while time.perf_counter() < state['stop']:
+            method, path, body, needs_auth = make_request(rng)
+            headers = {'Authorization': f'Bearer {rng.choice(tokens)}'} if needs_auth and tokens else {}
+            began = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body, headers)
+                ok = status < 400 or status == 404
+            except Exception:
+                ok = False
+            finished = time.perf_counter()
+            if began < state['measure_from']:
+                continue
+            if ok:
+                local.append(finished - began)
+            else:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    now = time.perf_counter()
+    state['measure_from'] = now + warmup
+    state['stop'] = now + warmup + duration
+    start_barrier.wait()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], duration)
+
+
+def login_tokens(client, count, password, first_user):
+    tokens = []
+    for i in range(first_user, first_user + count * 20):
+        if len(tokens) >= count:
+            break
+        status, payload = client.request('POST', '/api/auth/login', {'username': f'bench_user_{i}', 'password': password})
+        if status == 200:
+            tokens.append(json.loads(payload)['access_token'])
+    return tokens
+
+
+def discover(client):
+    """Approximate largest article id and the category names, from the API itself"""
+    status, payload = client.request('GET', '/api/categories')
+    categories = [c['name'] for c in json.loads(payload)['categories']] if status == 200 else ['india']
+    status, payload = client.request('GET', '/api/articles?per_page=1')
+    total = json.loads(payload)['pagination']['total_items'] if status == 200 else 1
+    return max(total, 1), categories or ['india']
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline, threshold):
+    """Print the p95 change per scenario; returns the scenarios that regressed"""
+    regressions = []
+    print(f"\nComparison with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or not previous['p95_ms']:
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        flag = ''
+        if change > threshold:
+            flag = '  <-- regression'
+            regressions.append(name)
+        print(f"  {name:24s} p95 {previous['p95_ms']:9.2f} -> {current['p95_ms']:9.2f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the NETRA API hot paths')
+    parser.add_argument('--base-url', help='server to benchmark; omit to run in-process on DATABASE_URL')
+    parser.add_argument('--scenarios', default='all', help='comma separated scenario names (default: all)')
+    parser.add_argument('--concurrency', '-c', type=int, default=8)
+    parser.add_argument('--duration', '-d', type=float, default=10, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds per scenario')
+    parser.add_argument('--users', type=int, default=20, help='bench users to log in for authenticated scenarios')
+    parser.add_argument('--password', default='bench123')
+    parser.add_argument('--first-user', type=int, default=1, help='lowest bench_user_<n> number to try')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/api-<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 slowdown counted as regression (default: 0.2)')
+    args = parser.parse_args()
+
+    if args.base_url:
+        make_client = lambda: HTTPClient(args.base_url)
+        target = args.base_url
+    else:
+        # Every simulated client shares one address; measure the endpoints, not the limiter
+        os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+        from app import app
+        make_client = lambda: InProcessClient(app)
+        target = 'in-process'
+
+    setup_client = make_client()
+    max_article_id, categories = discover(setup_client)
+    tokens = login_tokens(setup_client, args.users, args.password, args.first_user)
+    scenarios = build_scenarios(max_article_id, categories)
+    selected = list(scenarios) if args.scenarios == 'all' else [s.strip() for s in args.scenarios.split(',')]
+    if not tokens:
+        print("No bench users could log in; skipping authenticated scenarios (run generate_corpus.py first)")
+        selected = [s for s in selected if s not in ('vote', 'feed_authenticated')]
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'target': target,
+        'config': {'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup},
+        'scenarios': {},
+    }
+    print(f"Benchmarking {target} with {args.concurrency} clients, {args.duration:g}s per scenario\n")
+    print(f"  {'scenario':24s} {'req/s':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'errors':>7s}")
+    for name in selected:
+        summary = run_scenario(make_client, scenarios[name], tokens, args.concurrency,
+                               args.duration, args.warmup, args.seed)
+        results['scenarios'][name] = summary
+        print(f"  {name:24s} {summary['throughput_rps']:9.1f} {summary['p50_ms']:9.2f} "
+              f"{summary['p95_ms']:9.2f} {summary['p99_ms']:9.2f} {summary['errors']:7d}")
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"api-{results['commit']}-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+generate_corpus.py
+Generates a synthetic NETRA corpus of arbitrary size for benchmarking.
+
+Writes articles, related articles, users, votes and bookmarks straight into
+the database named by DATABASE_URL (PostgreSQL or SQLite) with batched
+executemany inserts. The same --seed always produces the same corpus.
+
+Benchmark users are named bench_user_<n> and share the password given by
+--password, so api_bench.py can log in as them.
+
+Run with:
+    DATABASE_URL=sqlite:///bench.db python benchmarks/generate_corpus.py \\
+        --articles 100000 --users 10000 --votes 1000000 --bookmarks 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (create_batch_app, db, User, Article, RelatedArticle, Vote, Bookmark,  # noqa: E402
+                    rebuild_bias_scores, rebuild_activity_buckets, backfill_sources)
+
+CATEGORIES = ['india', 'world', 'local', 'sports', 'business', 'science', 'technology', 'entertainment', 'health']
+SOURCES = [
+    'Hindustan Times', 'The Hindu', 'Indian Express', 'NDTV', 'Times of India', 'India Today',
+    'BBC', 'Reuters', 'Al Jazeera', 'The Guardian', 'CNN', 'Mint', 'Business Standard',
+    'Moneycontrol', 'The Print', 'Scroll', 'News18', 'Firstpost', 'Deccan Herald', 'The Wire',
+]
+WORDS = (
+    'government minister election court police rains market shares cricket match series film '
+    'release health hospital vaccine study scientists space mission launch policy budget tax '
+    'protest rally city state national global talks summit trade deal record crash fire flood'
+).split()
+
+BENCH_PASSWORD = 'bench123'
+
+
+def headline(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+
+
+def random_time(rng, now, days):
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def insert_batches(table, rows_iter, batch_size):
+    """Insert rows from an iterator in executemany batches; returns the row count"""
+    total = 0
+    batch = []
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        total += len(batch)
+    return total
+
+
+def next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def generate_articles(rng, count, related_per_article, batch_size):
+    now = datetime.utcnow()
+    first_id = next_id(Article)
+    tag = rng.getrandbits(32)
+
+    def articles():
+        for i in range(count):
+            source = rng.choice(SOURCES)
+            created = random_time(rng, now, 90)
+            yield {
+                'id': first_id + i,
+                'headline': headline(rng),
+                'author': f'Author {rng.randint(1, max(count // 20, 1))}' if rng.random() < 0.7 else None,
+                'article_link': f'https://bench.example/{tag:08x}/{first_id + i}',
+                'featured_image': f'/api/attachments/bench-{first_id + i}=-w280-h168-p-df',
+                'source_logo': f'https://logos.example/{source.replace(" ", "-").lower()}.png',
+                'source_name': source,
+                'publish_date': created.strftime('%d-%m-%Y'),
+                'category': rng.choice(CATEGORIES),
+                'created_at': created,
+            }
+
+    def related():
+        for i in range(count):
+            for j in range(rng.randint(0, related_per_article * 2)):
+                source = rng.choice(SOURCES)
+                yield {
+                    'primary_article_id': first_id + i,
+                    'headline': headline(rng),
+                    'author': None,
+                    'article_link': f'https://bench.example/{tag:08x}/{first_id + i}/related/{j}',
+                    'source_logo': f'https://logos.example/{source.replace(" ", "-").lower()}.png',
+                    'source_name': source,
+                    'publish_date': now.strftime('%d-%m-%Y'),
+                }
+
+    inserted = insert_batches(Article.__table__, articles(), batch_size)
+    related_count = insert_batches(RelatedArticle.__table__, related(), batch_size) if related_per_article else 0
+    return list(range(first_id, first_id + inserted)), related_count
+
+
+def generate_users(rng, count, password, batch_size):
+    now = datetime.utcnow()
+    first_id = next_id(User)
+    # Hashing is deliberately slow, so every benchmark user shares one hash
+    shared = User()
+    shared.set_password(password)
+
+    def users():
+        for i in range(count):
+            yield {
+                'id': first_id + i,
+                'username': f'bench_user_{first_id + i}',
+                'email': f'bench_user_{first_id + i}@bench.example',
+                'password_hash': shared.password_hash,
+                'created_at': random_time(rng, now, 120),
+            }
+
+    inserted = insert_batches(User.__table__, users(), batch_size)
+    return list(range(first_id, first_id + inserted))
+
+
+def spread(rng, total, buckets):
+    """Split total into `buckets` random, roughly even, non-negative parts"""
+    if buckets == 0:
+        return []
+    base, extra = divmod(total, buckets)
+    counts = [base] * buckets
+    for i in rng.sample(range(buckets), extra):
+        counts[i] += 1
+    return counts
+
+
+def user_article_pairs(rng, user_ids, article_ids, total):
+    """Yield (user_id, article_id) pairs, unique per user"""
+    per_user = spread(rng, total, len(user_ids))
+    for user_id, k in zip(user_ids, per_user):
+        for index in rng.sample(range(len(article_ids)), min(k, len(article_ids))):
+            yield user_id, article_ids[index]
+
+
+def generate_votes(rng, user_ids, article_ids, count, batch_size):
+    now = datetime.utcnow()
+    # Give articles different bias tendencies so the stats have some shape
+    tendencies = [rng.uniform(0.25, 0.75) for _ in range(97)]
+
+    def votes():
+        for user_id, article_id in user_article_pairs(rng, user_ids, article_ids, count):
+            yield {
+                'user_id': user_id,
+                'article_id': article_id,
+                'is_biased': rng.random() < tendencies[article_id % len(tendencies)],
+                'created_at': random_time(rng, now, 45),
+            }
+
+    return insert_batches(Vote.__table__, votes(), batch_size)
+
+
+def generate_bookmarks(rng, user_ids, article_ids, count, batch_size):
+    now = datetime.utcnow()
+
+    def bookmarks():
+        for user_id, article_id in user_article_pairs(rng, user_ids, article_ids, count):
+            yield {'user_id': user_id, 'article_id': article_id, 'created_at': random_time(rng, now, 45)}
+
+    return insert_batches(Bookmark.__table__, bookmarks(), batch_size)
+
+
+def generate_corpus(articles, users, votes, bookmarks, related_per_article=2, seed=42,
+                    password=BENCH_PASSWORD, batch_size=5000, log=print):
+    """Create tables if needed and add a synthetic corpus. Returns row counts."""
+    rng = random.Random(seed)
+    db.create_all()
+    started = time.perf_counter()
+
+    article_ids, related_count = generate_articles(rng, articles, related_per_article, batch_size)
+    log(f"  {len(article_ids)} articles, {related_count} related articles")
+    user_ids = generate_users(rng, users, password, batch_size)
+    log(f"  {len(user_ids)} users")
+    vote_count = generate_votes(rng, user_ids, article_ids, votes, batch_size)
+    log(f"  {vote_count} votes")
+    bookmark_count = generate_bookmarks(rng, user_ids, article_ids, bookmarks, batch_size)
+    log(f"  {bookmark_count} bookmarks")
+    backfill_sources()
+    rebuild_bias_scores()
+    rebuild_activity_buckets()
+    db.session.commit()
+
+    if db.engine.dialect.name == 'postgresql':
+        # Explicit ids were inserted, so move the sequences past them
+        for table in ('users', 'articles'):
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            ))
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    log(f"  done in {elapsed:.1f}s")
+    return {
+        'articles': len(article_ids), 'related_articles': related_count, 'users': len(user_ids),
+        'votes': vote_count, 'bookmarks': bookmark_count, 'seconds': round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic NETRA corpus for benchmarks')
+    parser.add_argument('--articles', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--votes', type=int, default=100000)
+    parser.add_argument('--bookmarks', type=int, default=20000)
+    parser.add_argument('--related-per-article', type=int, default=2,
+                        help='average related articles per article (default: 2)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default=BENCH_PASSWORD, help='password of the bench_user_* accounts')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    with create_batch_app().app_context():
+        print(f"Generating corpus into {db.engine.url.render_as_string(hide_password=True)}")
+        generate_corpus(args.articles, args.users, args.votes, args.bookmarks,
+                        related_per_article=args.related_per_article, seed=args.seed,
+                        password=args.password, batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
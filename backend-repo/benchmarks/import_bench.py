@@ -0,0 +1,119 @@
+"""
+import_bench.py
+Cold-start cost of the backend modules, from python -X importtime.
+
+Every gunicorn worker, scheduled load_data.py run and one-off script pays
+its imports before doing any work. For each target module this runs
+`python -X importtime -c "import <module>"` in a fresh interpreter,
+--repeat times, and reports the median import time and the heaviest
+modules it pulled in (cumulative microseconds, as importtime reports).
+The batch tools import models.py, not app.py, so their row should stay
+well below the web app's.
+
+    python benchmarks/import_bench.py
+    python benchmarks/import_bench.py --modules models,load_data --repeat 9 --top 15
+    python benchmarks/import_bench.py --budget models=400 --budget load_data=450
+
+--budget MODULE=MS exits with status 1 when the median import of MODULE
+takes longer than MS milliseconds, for use in CI. The environment is
+passed through, so set DATABASE_URL as in production (the database
+dialect is part of the cost; nothing is connected). Results are written
+to benchmarks/results/import-<commit>-<time>.json.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from api_bench import git_commit
+
+DEFAULT_MODULES = 'models,load_data,clustering,populate_dummy_data,app,asgi'
+
+
+def import_profile(module):
+    """{imported module: (self us, cumulative us)} for one fresh `import module`, limited to
+    what that import pulled in (interpreter startup and site hooks are left out)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=dict(os.environ, DB_PROCESS_ROLE=os.environ.get('DB_PROCESS_ROLE', 'batch')),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    subtree = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        head, cumulative, name = line.split('|')
+        entry = (name.strip(), int(head.split(':')[1]), int(cumulative))
+        # importtime prints children before their parent, so a top-level line closes a subtree
+        if name.strip() == module and not name[1:].startswith(' '):
+            return {n: (own, cum) for n, own, cum in subtree + [entry]}
+        subtree = [] if not name[1:].startswith(' ') else subtree + [entry]
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of the backend modules')
+    parser.add_argument('--modules', default=DEFAULT_MODULES, help=f'comma separated (default: {DEFAULT_MODULES})')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per module; the median is reported')
+    parser.add_argument('--top', type=int, default=8, help='heaviest imports listed per module')
+    parser.add_argument('--budget', action='append', default=[], metavar='MODULE=MS',
+                        help='fail when the median import of MODULE exceeds MS milliseconds (repeatable)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/import-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    budgets = {name.strip(): float(ms) for name, _, ms in (b.partition('=') for b in args.budget)}
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'modules': {},
+    }
+    over_budget = []
+    for module in [m.strip() for m in args.modules.split(',')]:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        total_ms = statistics.median(run[module][1] for run in runs) / 1000
+        heaviest = {}
+        for name in runs[0]:
+            if name != module and all(name in run for run in runs):
+                heaviest[name] = statistics.median(run[name][1] for run in runs) / 1000
+        # Only the outermost of nested heavy imports: skip modules inside an already listed package
+        top = []
+        for name, ms in sorted(heaviest.items(), key=lambda item: -item[1]):
+            if not any(name.startswith(parent + '.') for parent, _ in top):
+                top.append((name, ms))
+            if len(top) == args.top:
+                break
+        results['modules'][module] = {
+            'median_ms': round(total_ms, 1),
+            'modules_imported': round(statistics.median(len(run) for run in runs)),
+            'heaviest_ms': {name: round(ms, 1) for name, ms in top},
+        }
+        flag = ''
+        if module in budgets and total_ms > budgets[module]:
+            flag = f'  <-- over budget ({budgets[module]:.0f} ms)'
+            over_budget.append(module)
+        print(f"  {module:22s} {total_ms:8.1f} ms  {results['modules'][module]['modules_imported']:5d} modules{flag}")
+        print("      " + ", ".join(f"{name} {ms:.1f}" for name, ms in top))
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f"import-{results['commit']}-{datetime.utcnow():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
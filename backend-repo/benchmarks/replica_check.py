@@ -0,0 +1,178 @@
+"""
+replica_check.py
+Checks the read replica routing against two local SQLite files.
+
+The primary is created with the schema, one user and a few articles, then
+copied to the replica, and the replica's headlines are marked so a
+response shows where it was read from. Every statement is counted per
+engine, and each check asserts which database a request used:
+
+    anonymous article reads, /api/categories, /api/stats/*   replica
+    reads made with a token, votes                            primary
+    replica lagging or unreachable                            primary
+
+SQLite has no replication, so lag and outages are simulated by replacing
+database._measure_replica_lag for the duration of a check.
+
+    python benchmarks/replica_check.py
+
+Exits with status 1 if any check fails.
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+REPLICA_MARK = '[replica] '
+
+
+def setup_databases(workdir):
+    primary = os.path.join(workdir, 'primary.db')
+    replica = os.path.join(workdir, 'replica.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{primary}'
+    os.environ['DATABASE_REPLICA_URL'] = f'sqlite:///{replica}'
+    # Measure the lag on every request, so the simulated lag applies at once
+    os.environ['DB_REPLICA_LAG_CHECK_SECONDS'] = '0'
+    os.environ['VOTE_WRITE_BEHIND'] = '0'
+    os.environ.setdefault('STREAM_ENABLED', '0')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    return primary, replica
+
+
+def populate(app, db, Article):
+    """Schema on the primary, one registered user and three articles; returns a token"""
+    from datetime import datetime
+    with app.app_context():
+        db.create_all(bind_key=None)
+        now = datetime.utcnow()
+        db.session.execute(Article.__table__.insert(), [
+            {'id': i, 'headline': f'Article {i}', 'article_link': f'https://bench.example/replica/{i}',
+             'source_name': 'Source', 'category': 'national', 'created_at': now}
+            for i in range(1, 4)
+        ])
+        db.session.commit()
+    response = app.test_client().post('/api/auth/register', json={
+        'username': 'replica_user', 'email': 'replica_user@bench.example', 'password': 'replica123'})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['access_token']
+
+
+def make_replica(app, db, primary, replica):
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    shutil.copyfile(primary, replica)
+    with sqlite3.connect(replica) as conn:
+        conn.execute("UPDATE articles SET headline = ? || headline", (REPLICA_MARK,))
+
+
+class StatementCounter:
+    """Statements executed per engine, counted with a cursor event"""
+
+    def __init__(self, app, db):
+        from database import REPLICA_BIND
+        from sqlalchemy import event
+        self.counts = {}
+        with app.app_context():
+            for name, engine in (('primary', db.engines[None]), ('replica', db.engines[REPLICA_BIND])):
+                self.counts[name] = 0
+                event.listen(engine, 'before_cursor_execute', self._counter(name))
+
+    def _counter(self, name):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.counts[name] += 1
+        return count
+
+    def reset(self):
+        for name in self.counts:
+            self.counts[name] = 0
+
+
+@contextmanager
+def replica_lag(measure):
+    """Replace the lag measurement while the block runs"""
+    import database
+    original = database._measure_replica_lag
+    database._measure_replica_lag = measure
+    try:
+        yield
+    finally:
+        database._measure_replica_lag = original
+
+
+def unreachable(engine):
+    raise ConnectionError('replica down')
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='replica-check-')
+    primary, replica = setup_databases(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    from app import app, db, Article
+
+    failures = 0
+    try:
+        token = populate(app, db, Article)
+        make_replica(app, db, primary, replica)
+        counter = StatementCounter(app, db)
+        client = app.test_client()
+        auth = {'Authorization': f'Bearer {token}'}
+
+        def check(name, expected, method, path, headers=None, json=None, lag=None):
+            nonlocal failures
+            counter.reset()
+            if lag is None:
+                response = client.open(path, method=method, headers=headers, json=json)
+            else:
+                with replica_lag(lag):
+                    response = client.open(path, method=method, headers=headers, json=json)
+            used = sorted(engine for engine, count in counter.counts.items() if count)
+            ok = response.status_code < 400 and used == [expected]
+            body = response.get_data(as_text=True)
+            if ok and path.startswith('/api/articles'):
+                # The data must come from the same place as the statements
+                ok = (REPLICA_MARK in body) == (expected == 'replica')
+            failures += not ok
+            print(f"  {'ok  ' if ok else 'FAIL'} {name:44s} {method} {path:28s} -> "
+                  f"{response.status_code} via {', '.join(used) or 'no database'}")
+
+        print(f"  primary {primary}\n  replica {replica}\n")
+        check('anonymous feed read', 'replica', 'GET', '/api/articles')
+        check('anonymous article read', 'replica', 'GET', '/api/articles/1')
+        check('categories', 'replica', 'GET', '/api/categories')
+        check('stats (concurrent scans)', 'replica', 'GET', '/api/stats/all')
+        check('stats section', 'replica', 'GET', '/api/stats/voting')
+        check('feed read with a token', 'primary', 'GET', '/api/articles', headers=auth)
+        check('vote', 'primary', 'POST', '/api/articles/1/vote', headers=auth, json={'is_biased': True})
+        check('anonymous read, replica 30 s behind', 'primary', 'GET', '/api/articles', lag=lambda engine: 30.0)
+        check('stats, replica 30 s behind', 'primary', 'GET', '/api/stats/all', lag=lambda engine: 30.0)
+        check('anonymous read, replica unreachable', 'primary', 'GET', '/api/articles', lag=unreachable)
+        check('anonymous read, replica caught up again', 'replica', 'GET', '/api/articles')
+
+        with sqlite3.connect(primary) as conn:
+            primary_votes = conn.execute("SELECT count(*) FROM votes").fetchone()[0]
+        with sqlite3.connect(replica) as conn:
+            replica_votes = conn.execute("SELECT count(*) FROM votes").fetchone()[0]
+        ok = primary_votes == 1 and replica_votes == 0
+        failures += not ok
+        print(f"  {'ok  ' if ok else 'FAIL'} {'vote stored on the primary only':44s} "
+              f"primary {primary_votes}, replica {replica_votes}")
+    finally:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{failures} check(s) failed" if failures else "\nAll checks passed")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+bias.py
+Smoothed bias estimates for sources and authors.
+
+A raw biased/total ratio swings wildly for a source with three votes. Each
+source or author is instead given a Beta prior equivalent to
+BIAS_PRIOR_STRENGTH pseudo-votes (default 10) at a bias rate of
+BIAS_PRIOR_MEAN (default 0.5), and its score is the posterior mean
+
+    (biased + mean * strength) / (total + strength)
+
+which moves from the prior towards the observed ratio as votes accumulate.
+The interval is a normal approximation of the Beta posterior, using the
+posterior's own standard deviation. The vote counts the estimate needs
+live in the bias_scores table, kept up to date incrementally as votes
+change (see models.apply_vote_deltas).
+"""
+
+import math
+import os
+
+Z_95 = 1.96
+
+
+class BiasPrior:
+
+    def __init__(self, mean=0.5, strength=10.0):
+        self.mean = mean
+        self.strength = strength
+        self.alpha = mean * strength
+        self.beta = (1 - mean) * strength
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            mean=float(os.environ.get('BIAS_PRIOR_MEAN', 0.5)),
+            strength=float(os.environ.get('BIAS_PRIOR_STRENGTH', 10)),
+        )
+
+    def score_expression(self, biased, total):
+        """The posterior mean as a SQL expression over count columns, for ORDER BY"""
+        return (biased + self.alpha) / (total + self.alpha + self.beta)
+
+    def score(self, biased, total):
+        """The posterior mean, as score_expression computes it in SQL"""
+        return (biased + self.alpha) / (total + self.alpha + self.beta)
+
+    def estimate(self, biased, total):
+        """Posterior mean and 95% interval, as percentages"""
+        a = biased + self.alpha
+        b = (total - biased) + self.beta
+        mean = a / (a + b)
+        spread = Z_95 * math.sqrt(a * b / ((a + b) ** 2 * (a + b + 1)))
+        return {
+            'bias_score': round(mean * 100, 1),
+            'ci_low': round(max(0.0, mean - spread) * 100, 1),
+            'ci_high': round(min(1.0, mean + spread) * 100, 1),
+        }
@@ -0,0 +1,223 @@
+"""
+clustering.py
+Groups articles about the same event into stories.
+
+Two articles belong to the same story when they share a link (an
+article's own link or any of its related_articles links) or when their
+headlines are similar enough (Jaccard similarity of their word sets, at
+least STORY_HEADLINE_THRESHOLD, default 0.5). Matches are merged
+transitively with a disjoint-set (union-find) structure. Candidate pairs
+come from inverted indexes on links and headline words, so articles
+that share nothing are never compared.
+
+load_data.py calls assign_stories() after every import. It re-clusters
+the articles of the last STORY_WINDOW_DAYS (default 3) together with their
+existing stories, so story ids stay stable and clusters only grow or
+merge. Only groups of two or more articles get a Story row, and the feed
+collapses on Article.story_id.
+
+Backfill an existing database with:
+    python clustering.py --days 3650
+"""
+
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+
+from models import create_batch_app, db, Article, RelatedArticle, Story  # noqa: E402
+
+STOPWORDS = frozenset(
+    'a an the and or but of in on at to for from by with as is are was were be been has have had '
+    'it its this that these those into over after before about than amid says said will would can '
+    'could new news more live latest updates update video watch top world india'.split()
+)
+# Words in more than this many headlines of the window are too common to
+# pick candidates from (they still count towards the similarity)
+MAX_WORD_FREQUENCY = 200
+
+
+class DisjointSet:
+    """Union-find with path halving and union by size"""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+    def groups(self):
+        """{root: [items]} for every set"""
+        result = defaultdict(list)
+        for item in self.parent:
+            result[self.find(item)].append(item)
+        return result
+
+
+def clean_headline(headline):
+    """Strip the Google News decorations: a leading "More - " and a trailing " | Section" """
+    headline = re.sub(r'^\s*More\s*-\s*', '', headline or '')
+    return re.sub(r'\s+\|[^|]*$', '', headline).strip()
+
+
+def headline_words(headline):
+    words = re.findall(r'[a-z0-9]+', clean_headline(headline).lower())
+    return frozenset(w for w in words if w not in STOPWORDS and len(w) > 1)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def cluster(articles, threshold=0.5, min_words=3):
+    """Cluster (id, headline, links) tuples; returns a DisjointSet over the ids"""
+    sets = DisjointSet()
+    first_with_link = {}
+    words_by_id = {}
+    word_index = defaultdict(list)
+
+    for article_id, headline, links in articles:
+        sets.add(article_id)
+        for link in links:
+            if link in first_with_link:
+                sets.union(article_id, first_with_link[link])
+            else:
+                first_with_link[link] = article_id
+        words = headline_words(headline)
+        if len(words) >= min_words:
+            words_by_id[article_id] = words
+            for word in words:
+                word_index[word].append(article_id)
+
+    for article_id, words in words_by_id.items():
+        candidates = set()
+        for word in words:
+            ids = word_index[word]
+            if len(ids) <= MAX_WORD_FREQUENCY:
+                candidates.update(ids)
+        for other in candidates:
+            # Each pair once; skip pairs that are already in the same story
+            if other < article_id and sets.find(other) != sets.find(article_id):
+                if jaccard(words, words_by_id[other]) >= threshold:
+                    sets.union(article_id, other)
+    return sets
+
+
+def assign_stories(window_days=None, threshold=None):
+    """Cluster recent articles into stories and update the stories table.
+    Returns (stories created, stories updated)."""
+    window_days = float(window_days or os.environ.get('STORY_WINDOW_DAYS', 3))
+    threshold = float(threshold or os.environ.get('STORY_HEADLINE_THRESHOLD', 0.5))
+    since = datetime.utcnow() - timedelta(days=window_days)
+
+    recent = db.session.query(Article.id, Article.headline, Article.article_link, Article.story_id).filter(
+        Article.created_at >= since
+    ).all()
+    if not recent:
+        return 0, 0
+    links = defaultdict(set)
+    for article_id, _, link, _ in recent:
+        links[article_id].add(link)
+    recent_ids = [row[0] for row in recent]
+    for article_id, link in db.session.query(RelatedArticle.primary_article_id, RelatedArticle.article_link).filter(
+        RelatedArticle.primary_article_id.in_(recent_ids), RelatedArticle.article_link.isnot(None)
+    ):
+        links[article_id].add(link)
+
+    sets = cluster(((row[0], row[1], links[row[0]]) for row in recent), threshold)
+    # Keep what was decided before: articles already in a story stay together
+    story_members = defaultdict(list)
+    for article_id, _, _, story_id in recent:
+        if story_id is not None:
+            story_members[story_id].append(article_id)
+    for members in story_members.values():
+        for article_id in members[1:]:
+            sets.union(members[0], article_id)
+
+    current_story = {row[0]: row[3] for row in recent}
+    created = 0
+    touched = set()
+    for members in sets.groups().values():
+        stories = sorted({current_story[a] for a in members if current_story[a] is not None})
+        if len(members) < 2 and not stories:
+            continue
+        if stories:
+            story_id = stories[0]
+            if len(stories) > 1:
+                # Two stories turned out to be one: move everything to the oldest
+                Article.query.filter(Article.story_id.in_(stories[1:])).update(
+                    {'story_id': story_id}, synchronize_session=False)
+                Story.query.filter(Story.id.in_(stories[1:])).delete(synchronize_session=False)
+        else:
+            story = Story(created_at=datetime.utcnow())
+            db.session.add(story)
+            db.session.flush()
+            story_id = story.id
+            created += 1
+        moved = [a for a in members if current_story[a] != story_id]
+        if moved or len(stories) > 1:
+            Article.query.filter(Article.id.in_(moved)).update({'story_id': story_id}, synchronize_session=False)
+            touched.add(story_id)
+    if touched:
+        refresh_story_stats(touched)
+    db.session.commit()
+    return created, len(touched) - created
+
+
+def refresh_story_stats(story_ids):
+    """Recompute the precomputed headline and counts of the given stories"""
+    story_ids = list(story_ids)
+    counts = db.session.query(
+        Article.story_id,
+        db.func.count(Article.id),
+        db.func.count(db.func.distinct(Article.source_id)),
+        db.func.min(Article.id),
+        db.func.max(Article.created_at),
+    ).filter(Article.story_id.in_(story_ids)).group_by(Article.story_id).all()
+    first_headlines = dict(db.session.query(Article.id, Article.headline).filter(
+        Article.id.in_([row[3] for row in counts])))
+    for story_id, article_count, source_count, first_id, last_article_at in counts:
+        db.session.query(Story).filter(Story.id == story_id).update({
+            'headline': clean_headline(first_headlines.get(first_id)),
+            'article_count': article_count,
+            'source_count': source_count,
+            'updated_at': last_article_at,
+        }, synchronize_session=False)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Group articles into stories')
+    parser.add_argument('--days', type=float, help='how far back to cluster (default: STORY_WINDOW_DAYS or 3)')
+    parser.add_argument('--threshold', type=float, help='headline similarity needed to merge (default 0.5)')
+    args = parser.parse_args()
+
+    with create_batch_app().app_context():
+        db.create_all()
+        created, updated = assign_stories(args.days, args.threshold)
+        print(f"✓ Stories: {created} created, {updated} updated")
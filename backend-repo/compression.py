@@ -0,0 +1,72 @@
+"""
+compression.py
+Response compression for the JSON API.
+
+Feed pages repeat long Google News links and logo URLs on every article,
+so they compress very well. Responses of at least COMPRESS_MIN_BYTES
+(default 1024) with a text-like content type are compressed with brotli
+(when the brotli package is installed and the client accepts "br") or
+gzip. Already-compressed bodies (images, files sent with send_file) and
+streamed responses are left alone.
+
+    COMPRESS_ENABLED         default 1
+    COMPRESS_MIN_BYTES       default 1024
+    COMPRESS_GZIP_LEVEL      default 6
+    COMPRESS_BROTLI_QUALITY  default 5 (brotli's 11 is far too slow per request)
+"""
+
+import gzip
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+
+
+def _compressible(response, min_bytes):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    if not (response.mimetype or '').startswith(COMPRESSIBLE):
+        return False
+    return (response.calculate_content_length() or 0) >= min_bytes
+
+
+def init_compression(app):
+    """Compress responses in an after_request hook unless COMPRESS_ENABLED=0"""
+    if os.environ.get('COMPRESS_ENABLED', '1') == '0':
+        return
+    min_bytes = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    gzip_level = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    brotli_quality = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if not _compressible(response, min_bytes):
+            return response
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if encoding == 'br':
+            body = brotli.compress(data, quality=brotli_quality)
+        else:
+            body = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        # The bytes changed, so a strong validator on the identity body no longer holds
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
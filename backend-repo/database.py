@@ -0,0 +1,247 @@
+"""
+database.py
+Engine and connection-pool configuration for the NETRA backend.
+
+Every process that talks to the database (the API workers, load_data.py,
+populate_dummy_data.py and the scheduler's loader subprocess) builds its
+engine from the same environment variables, so pool sizing can be tuned
+per deployment without touching code:
+
+    DB_PROCESS_ROLE          web (default) or batch - picks the defaults below
+    DB_POOL_SIZE             persistent connections per process (web 5, batch 1)
+    DB_MAX_OVERFLOW          extra connections allowed under burst (web 10, batch 0)
+    DB_POOL_TIMEOUT          seconds to wait for a free connection (default 10)
+    DB_POOL_RECYCLE          seconds before a connection is recycled (default 1800)
+    DB_POOL_PRE_PING         test connections on checkout (default true)
+    DB_STATEMENT_TIMEOUT_MS  server-side statement timeout (web 15000, batch 0 = off)
+    DB_PGBOUNCER             true when connecting through PgBouncer in
+                             transaction-pooling mode
+    DATABASE_REPLICA_URL     optional read replica for analytics and anonymous reads
+    DB_REPLICA_MAX_LAG_SECONDS  replication lag tolerated before reads fall
+                             back to the primary (default 5)
+
+With gunicorn the total connection count is roughly
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW), which must stay below the
+server's max_connections (or PgBouncer's pool).
+"""
+
+import functools
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+REPLICA_BIND = 'replica'
+
+ROLE_DEFAULTS = {
+    'web': {'pool_size': 5, 'max_overflow': 10, 'statement_timeout_ms': 15000},
+    'batch': {'pool_size': 1, 'max_overflow': 0, 'statement_timeout_ms': 0},
+}
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def process_role():
+    """Returns the configured process role ('web' or 'batch')"""
+    role = os.environ.get('DB_PROCESS_ROLE', 'web').strip().lower()
+    return role if role in ROLE_DEFAULTS else 'web'
+
+
+def pgbouncer_mode():
+    return _env_bool('DB_PGBOUNCER', False)
+
+
+def statement_timeout_ms():
+    return _env_int('DB_STATEMENT_TIMEOUT_MS', ROLE_DEFAULTS[process_role()]['statement_timeout_ms'])
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._metrics_lock:
+                self.checkouts += 1
+                self.checkout_timeouts += int(timed_out)
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def engine_options(database_uri):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for the given database URI"""
+    if not database_uri.startswith('postgresql'):
+        # SQLite (local runs, tests) keeps SQLAlchemy's default pool
+        return {}
+
+    defaults = ROLE_DEFAULTS[process_role()]
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'connect_args': {},
+    }
+
+    if pgbouncer_mode():
+        # PgBouncer already pools server connections, so keep none locally.
+        # Transaction pooling also drops startup parameters such as
+        # "options", so the statement timeout is applied per transaction
+        # in configure_engine() instead. psycopg2 never uses server-side
+        # prepared statements, which is what PgBouncer cannot track.
+        options['poolclass'] = NullPool
+        return options
+
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': _env_int('DB_POOL_SIZE', defaults['pool_size']),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', defaults['max_overflow']),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    })
+
+    timeout = statement_timeout_ms()
+    if timeout > 0:
+        options['connect_args']['options'] = f'-c statement_timeout={timeout}'
+    return options
+
+
+def configure_engine(engine):
+    """Attach per-engine hooks that cannot be expressed as engine options"""
+    if engine.dialect.name != 'postgresql' or not pgbouncer_mode():
+        return
+    timeout = statement_timeout_ms()
+    if timeout <= 0:
+        return
+
+    @event.listens_for(engine, 'begin')
+    def set_local_statement_timeout(conn):
+        conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def pool_status(engine):
+    """Snapshot of the engine's pool for monitoring"""
+    pool = engine.pool
+    status = {
+        'pool_class': pool.__class__.__name__,
+        'role': process_role(),
+        'pgbouncer': pgbouncer_mode(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        with pool._metrics_lock:
+            status.update({
+                'checkouts': pool.checkouts,
+                'checkout_timeouts': pool.checkout_timeouts,
+                'wait_seconds_total': round(pool.wait_seconds_total, 6),
+                'wait_seconds_max': round(pool.wait_seconds_max, 6),
+                'wait_seconds_avg': round(pool.wait_seconds_total / pool.checkouts, 6) if pool.checkouts else 0,
+            })
+    return status
+
+
+def replica_binds():
+    """SQLALCHEMY_BINDS entry for the read replica, if one is configured"""
+    url = os.environ.get('DATABASE_REPLICA_URL')
+    if not url:
+        return {}
+    return {REPLICA_BIND: {'url': url, **engine_options(url)}}
+
+
+_replica_lag = {'checked_at': 0.0, 'lag': None}
+_replica_lag_lock = threading.Lock()
+
+
+def _measure_replica_lag(engine):
+    if engine.dialect.name != 'postgresql':
+        return 0.0
+    with engine.connect() as conn:
+        # An idle but fully caught-up standby has an old replay timestamp,
+        # so only measure the time gap while WAL is still being replayed
+        lag = conn.execute(text(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )).scalar()
+    return float(lag or 0)
+
+
+def replica_lag_seconds(engine):
+    """Replica lag in seconds (cached briefly), or None if it is unreachable"""
+    interval = _env_int('DB_REPLICA_LAG_CHECK_SECONDS', 5)
+    with _replica_lag_lock:
+        if time.monotonic() - _replica_lag['checked_at'] < interval:
+            return _replica_lag['lag']
+        try:
+            lag = _measure_replica_lag(engine)
+        except Exception:
+            lag = None
+        _replica_lag.update(checked_at=time.monotonic(), lag=lag)
+        return lag
+
+
+def replica_usable(engine):
+    lag = replica_lag_seconds(engine)
+    return lag is not None and lag <= _env_int('DB_REPLICA_MAX_LAG_SECONDS', 5)
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica when the request allows it.
+
+    Flushes always go to the primary, so objects read from the replica can
+    still be modified and committed safely.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and replica_usable(engine):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_replica():
+    """Route the remaining reads of the current request to the replica"""
+    g.db_use_replica = True
+
+
+def replica_read(f):
+    """Decorator for endpoints that tolerate slightly stale data"""
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        use_replica()
+        return f(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,290 @@
+"""
+images.py
+Disk cache of resized article images and source logos.
+
+Scraped featured_image values are either absolute URLs or Google News
+relative paths (/api/attachments/...), and source logos are gstatic
+favicon URLs. Without a proxy every client fetches them from those third
+parties on every feed render. The backend now fetches each image once,
+stores the original under the SHA-256 of its bytes (identical images from
+different URLs are stored once), and renders small WebP or JPEG variants
+next to it. Responses carry long-lived cache headers and an ETag.
+
+Layout under IMAGE_CACHE_DIR:
+    urls/ab/<sha256 of url>            pointer: "<content hash> <content type>"
+    originals/cd/<content hash>        the image as fetched
+    variants/cd/<content hash>-<size>.<format>
+
+Files are touched on every hit. When the cache grows past
+IMAGE_CACHE_MAX_MB, the least recently used files are deleted until it
+is back under 90% of the cap. A pointer left without its original is
+refetched on the next request, and so is a file evicted while a request
+was about to serve it.
+
+Resizing needs Pillow (pip install Pillow). Without it, originals are
+served as they are. Pillow is imported on the first image request, not
+with the module, so scripts that never serve images don't pay for it.
+
+    IMAGE_CACHE_DIR          default backend-repo/image_cache
+    IMAGE_CACHE_MAX_MB       default 512
+    IMAGE_BASE_URL           base for relative paths (default https://news.google.com)
+    IMAGE_FETCH_TIMEOUT      seconds (default 5)
+    IMAGE_MAX_SOURCE_MB      largest image fetched (default 8)
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urljoin, urlparse
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height, crop to fill); logos keep their aspect ratio
+SIZES = {
+    'card': (560, 336, True),
+    'thumb': (280, 168, True),
+    'logo': (64, 64, False),
+}
+FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+USER_AGENT = 'Mozilla/5.0 (compatible; NetraImageProxy/1.0)'
+
+
+class ImageUnavailable(Exception):
+    """The image could not be fetched or decoded"""
+
+
+@functools.lru_cache(maxsize=None)
+def pillow():
+    """(PIL.Image, PIL.ImageOps, WebP support), or None without Pillow"""
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:  # optional: originals are served unresized
+        return None
+    return Image, ImageOps, features.check('webp')
+
+
+def webp_supported():
+    return pillow() is not None and pillow()[2]
+
+
+def _shard(root, kind, name):
+    return os.path.join(root, kind, name[:2], name)
+
+
+class ImageCache:
+
+    def __init__(self, root, max_bytes=512 * 1024 * 1024, base_url='https://news.google.com',
+                 timeout=5.0, max_source_bytes=8 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self._locks = [threading.Lock() for _ in range(64)]
+        self._size_lock = threading.Lock()
+        self._size = None           # estimated bytes on disk, measured on first write
+        self._failures = TTLCache(maxsize=10000, ttl=300)
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            root=env('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache')),
+            max_bytes=int(float(env('IMAGE_CACHE_MAX_MB', 512)) * 1024 * 1024),
+            base_url=env('IMAGE_BASE_URL', 'https://news.google.com'),
+            timeout=float(env('IMAGE_FETCH_TIMEOUT', 5)),
+            max_source_bytes=int(float(env('IMAGE_MAX_SOURCE_MB', 8)) * 1024 * 1024),
+        )
+
+    def source_url(self, value):
+        """Absolute http(s) URL for a stored image value, or None if there is no image"""
+        if not value or value.strip().upper() == 'N/A':
+            return None
+        url = urljoin(self.base_url + '/', value.strip())
+        return url if urlparse(url).scheme in ('http', 'https') else None
+
+    def negotiate(self, accept):
+        """Output format for a request's Accept header"""
+        return 'webp' if webp_supported() and 'image/webp' in (accept or '') else 'jpeg'
+
+    def get(self, url, size, fmt):
+        """(path, content type, etag) of the cached variant, fetching and rendering it on a miss"""
+        if self._failures.get(url):
+            raise ImageUnavailable(f"failed recently: {url}")
+        url_key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        with self._locks[int(url_key[:8], 16) % len(self._locks)]:
+            try:
+                content_hash, content_type = self._original(url, url_key)
+            except ImageUnavailable:
+                # Don't hammer a dead URL on every feed render
+                self._failures.set(url, True)
+                raise
+            if pillow() is None:
+                path = _shard(self.root, 'originals', content_hash)
+                self._touch(path)
+                return path, content_type, content_hash
+            path = _shard(self.root, 'variants', f'{content_hash}-{size}.{fmt}')
+            if os.path.exists(path):
+                self._touch(path)
+            else:
+                self._write(path, self._render(_shard(self.root, 'originals', content_hash), size, fmt))
+        return path, FORMATS[fmt], f'{content_hash[:32]}-{size}-{fmt}'
+
+    def open_variant(self, url, size, fmt):
+        """(open file, content type, etag) of the cached variant.
+        Eviction in this or another worker can unlink the file between get() and reading
+        it. An open handle keeps its data, and a file gone before it is opened is a miss."""
+        for attempt in range(3):
+            try:
+                path, content_type, etag = self.get(url, size, fmt)
+                return open(path, 'rb'), content_type, etag
+            except FileNotFoundError:
+                logger.info("Image evicted while serving %s, fetching again", url)
+        raise ImageUnavailable(f"evicted while serving: {url}")
+
+    def prefetch(self, urls_and_sizes, workers=8):
+        """Fetch and render the given (url, size) pairs in parallel; returns how many succeeded"""
+        formats = ['webp', 'jpeg'] if webp_supported() else ['jpeg']
+
+        def warm(pair):
+            url, size = pair
+            try:
+                for fmt in formats:
+                    self.get(url, size, fmt)
+                return True
+            except ImageUnavailable as e:
+                logger.info("Image prefetch skipped: %s", e)
+                return False
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(warm, set(urls_and_sizes)))
+
+    def _original(self, url, url_key):
+        pointer = _shard(self.root, 'urls', url_key)
+        if os.path.exists(pointer):
+            with open(pointer) as f:
+                content_hash, content_type = f.read().split(' ', 1)
+            original = _shard(self.root, 'originals', content_hash)
+            if os.path.exists(original):
+                self._touch(pointer)
+                self._touch(original)
+                return content_hash, content_type
+        data, content_type = self._fetch(url)
+        content_hash = hashlib.sha256(data).hexdigest()
+        original = _shard(self.root, 'originals', content_hash)
+        if not os.path.exists(original):
+            self._write(original, data)
+        self._write(pointer, f'{content_hash} {content_type}'.encode('utf-8'))
+        return content_hash, content_type
+
+    def _fetch(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept': 'image/*'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                content_type = response.headers.get_content_type()
+                data = response.read(self.max_source_bytes + 1)
+        except Exception as e:
+            raise ImageUnavailable(f"{url}: {e}") from e
+        if not content_type.startswith('image/'):
+            raise ImageUnavailable(f"{url}: not an image ({content_type})")
+        if len(data) > self.max_source_bytes:
+            raise ImageUnavailable(f"{url}: larger than {self.max_source_bytes} bytes")
+        return data, content_type
+
+    def _render(self, original_path, size, fmt):
+        width, height, crop = SIZES[size]
+        Image, ImageOps, _ = pillow()
+        try:
+            with Image.open(original_path) as image:
+                image = ImageOps.exif_transpose(image)
+                if crop:
+                    image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+                else:
+                    image.thumbnail((width, height), Image.LANCZOS)
+                if fmt == 'jpeg' and image.mode != 'RGB':
+                    # Flatten transparency onto white rather than black
+                    background = Image.new('RGB', image.size, 'white')
+                    rgba = image.convert('RGBA')
+                    background.paste(rgba, mask=rgba.split()[-1])
+                    image = background
+                elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+                    image = image.convert('RGBA')
+                out = BytesIO()
+                image.save(out, format=fmt.upper(), quality=80)
+                return out.getvalue()
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise ImageUnavailable(f"cannot decode {os.path.basename(original_path)}: {e}") from e
+
+    def _write(self, path, data):
+        """Write atomically, so readers never see half a file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._grew(len(data))
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _grew(self, nbytes):
+        with self._size_lock:
+            if self._size is None:
+                self._size = self.disk_usage()
+            else:
+                self._size += nbytes
+            if self._size <= self.max_bytes:
+                return
+            self._size = self.evict()
+
+    def disk_usage(self):
+        total = 0
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+    def evict(self, target=0.9):
+        """Delete least recently used files until the cache is under target * max_bytes.
+        Other workers share the directory, so the sizes are measured again here."""
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        limit = self.max_bytes * target
+        files.sort()
+        removed = 0
+        for _, size, path in files:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        logger.info("Image cache evicted %d files, %d bytes left", removed, total)
+        return total
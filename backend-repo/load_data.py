@@ -1,8 +1,27 @@
 import json
 import os
-from app import app, db, Article, RelatedArticle
+
+# Batch jobs use a small pool and no statement timeout (see database.py)
+os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+
+from models import create_batch_app, db, Article, RelatedArticle, resolve_source, source_cache, prefetch_images
+from clustering import assign_stories
 from datetime import datetime
 
+# Mapping of JSON files to categories
+JSON_FILES = {
+    'india_news.json': 'india',
+    'world_news.json': 'world',
+    'local_news.json': 'local',
+    'sports_news.json': 'sports',
+    'business_news.json': 'business',
+    'science_news.json': 'science',
+    'technology_news.json': 'technology',
+    'entertainment_news.json': 'entertainment',
+    'health_news.json': 'health'
+}
+
+
 def load_articles_from_json(json_file_path, category):
     """Load articles from a JSON file and insert them into the database"""
     
@@ -11,6 +30,12 @@ def load_articles_from_json(json_file_path, category):
     with open(json_file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
+    return load_articles(data, category)
+
+
+def load_articles(data, category):
+    """Insert scraped items (primary_article + related_articles) for one category"""
+    
     articles_loaded = 0
     
     for item in data:
@@ -33,8 +58,9 @@ def load_articles_from_json(json_file_path, category):
                 author=primary.get('author', 'N/A'),
                 article_link=primary.get('article_link'),
                 featured_image=primary.get('featured_image'),
-                source_logo=primary.get('source_logo'),
+                # The logo is kept once, on the source
                 source_name=primary.get('source_name'),
+                source_id=resolve_source(primary.get('source_name'), primary.get('source_logo')),
                 publish_date=primary.get('publish_date'),
                 category=category
             )
@@ -51,8 +77,8 @@ def load_articles_from_json(json_file_path, category):
                         headline=related.get('headline', 'N/A'),
                         author=related.get('author', 'N/A'),
                         article_link=related.get('article_link'),
-                        source_logo=related.get('source_logo'),
                         source_name=related.get('source_name'),
+                        source_id=resolve_source(related.get('source_name'), related.get('source_logo')),
                         publish_date=related.get('publish_date')
                     )
                     db.session.add(related_article)
@@ -66,6 +92,8 @@ def load_articles_from_json(json_file_path, category):
         except Exception as e:
             print(f"  Error loading article: {str(e)}")
             db.session.rollback()
+            # Sources created in the rolled back transaction are gone again
+            source_cache.clear()
             continue
     
     db.session.commit()
@@ -73,27 +101,14 @@ def load_articles_from_json(json_file_path, category):
     return articles_loaded
 
 
-def load_all_categories():
-    """Load all articles from all JSON files"""
-    
-    # Mapping of JSON files to categories
-    json_files = {
-        'india_news.json': 'india',
-        'world_news.json': 'world',
-        'local_news.json': 'local',
-        'sports_news.json': 'sports',
-        'business_news.json': 'business',
-        'science_news.json': 'science',
-        'technology_news.json': 'technology',
-        'entertainment_news.json': 'entertainment',
-        'health_news.json': 'health'
-    }
+def load_all_categories(data_dir=None):
+    """Load all articles from all JSON files in data_dir (searched for if not given)"""
     
     # Try multiple possible data locations
-    possible_data_dirs = [
+    possible_data_dirs = [data_dir] if data_dir else [
         './data',                           # data/ in backend-repo
-        '../scraped_data/all_data',           # scraped_data from project root
-        './scraped_data/all_data',            # if run from project root
+        '../scraped_data/alldata',            # scraped_data from project root
+        './scraped_data/alldata',             # if run from project root
         '/mnt/user-data/uploads',          # original location (for testing)
     ]
     
@@ -115,7 +130,8 @@ def load_all_categories():
             print(f"  - {dir_path}")
         print("\nYou can:")
         print("  1. Create a 'data' directory and copy JSON files there")
-        print("  2. Create a symlink: ln -s ../scraped_data/all_data data")
+        print("  2. Create a symlink: ln -s ../scraped_data/alldata data")
+        print("  3. Pass the directory: python load_data.py ../scraped_data/23Nov")
         return 0
     
     total_loaded = 0
@@ -124,7 +140,7 @@ def load_all_categories():
     print("Starting data import process...")
     print("=" * 60 + "\n")
     
-    for json_file, category in json_files.items():
+    for json_file, category in JSON_FILES.items():
         json_path = os.path.join(data_dir, json_file)
         
         if os.path.exists(json_path):
@@ -142,15 +158,28 @@ def load_all_categories():
 
 
 if __name__ == '__main__':
-    with app.app_context():
+    import sys
+    
+    with create_batch_app().app_context():
         print("\n🔄 Creating database tables...")
         db.create_all()
         print("✓ Database tables created successfully!\n")
         
         print("🔄 Loading articles from JSON files...")
-        total_loaded = load_all_categories()
+        started = datetime.utcnow()
+        total_loaded = load_all_categories(sys.argv[1] if len(sys.argv) > 1 else None)
         
         if total_loaded > 0:
+            print("🔄 Grouping articles into stories...")
+            created, updated = assign_stories()
+            print(f"✓ Stories: {created} created, {updated} updated\n")
+
+            if os.environ.get('IMAGE_PREFETCH', '1') != '0':
+                # Fetch the new articles' images once now rather than on first view
+                print("🔄 Prefetching images...")
+                cached, requested = prefetch_images(Article.query.filter(Article.created_at >= started))
+                print(f"✓ Images: {cached} of {requested} cached\n")
+            
             # Print summary statistics
             print("\n📊 Database Summary:")
             print(f"  Total articles: {Article.query.count()}")
@@ -0,0 +1,293 @@
+"""
+partitions.py
+Monthly range partitioning of votes and bookmarks on PostgreSQL.
+
+votes and bookmarks only ever grow. Partitioned by month on created_at,
+every month is its own table with its own indexes. Inserts only touch
+the current month's small, hot indexes. Autovacuum works through one
+month at a time instead of the whole history. Queries bounded on
+created_at (the newest votes, a user's latest bookmarks) skip the other
+months. Old months leave with a metadata-only DETACH or DROP instead of
+a huge DELETE.
+
+PostgreSQL requires every unique index on a partitioned table to include
+the partition key, so (user_id, article_id) can no longer be unique on
+the table itself. Each partitioned table gets a companion keys table
+(vote_keys, bookmark_keys) with (user_id, article_id) as its primary key
+and the row's created_at. A trigger adds the key of every inserted row
+and removes it for every deleted row, so a second vote or bookmark by
+the same user on the same article still fails with a unique violation,
+whoever inserts it. models.upsert_votes uses the keys to update an
+existing vote in its own month's partition. The key columns are never
+updated in place.
+
+Partitioning is opt-in and PostgreSQL only. SQLite and databases that
+were never converted keep the plain tables. Convert once, with the API
+stopped (both tables are rewritten in one transaction), then restart it:
+
+    python partitions.py --convert
+    python partitions.py --status
+
+The scheduler runs `python partitions.py --maintain` after every load.
+Maintenance creates the partitions for the current month and the next
+PARTITION_MONTHS_AHEAD months (default 3). When PARTITION_RETAIN_MONTHS
+is set (default 0: keep everything), it detaches the months older than
+that, or drops them with PARTITION_ARCHIVE=drop. Detached months stay in
+the database as plain tables (votes_p2025_01, ...) to pg_dump and drop
+later. Archived votes and bookmarks no longer count towards article vote
+stats, bookmark lists or the stats scans. Archiving subtracts its votes
+from bias_scores, so a user who votes again on an article whose vote was
+archived is counted once, and rebuild_bias_scores still agrees. The
+activity time series keeps them. On databases that are not partitioned,
+maintenance does nothing.
+"""
+
+import re
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, text
+
+# Partitioned table -> its keys table
+PARTITIONED = {'votes': 'vote_keys', 'bookmarks': 'bookmark_keys'}
+
+# Kept out of the models' metadata: db.create_all() must not create them on plain databases
+key_metadata = MetaData()
+KEY_TABLES = {
+    table: Table(
+        keys, key_metadata,
+        Column('user_id', Integer, primary_key=True),
+        Column('article_id', Integer, primary_key=True),
+        Column('created_at', DateTime, nullable=False),
+    )
+    for table, keys in PARTITIONED.items()
+}
+
+_partitioned = None
+
+
+def partitioned_tables(engine):
+    """The PARTITIONED tables that are partitioned on this database, looked up once per process"""
+    global _partitioned
+    if _partitioned is None:
+        if engine.dialect.name != 'postgresql':
+            _partitioned = frozenset()
+        else:
+            with engine.connect() as conn:
+                _partitioned = frozenset(conn.execute(text(
+                    "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                    "WHERE c.oid IN (to_regclass('votes'), to_regclass('bookmarks'))"
+                )).scalars())
+    return _partitioned
+
+
+def month_start(when):
+    return datetime(when.year, when.month, 1)
+
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def partitions(conn, table):
+    """[(name, first day of its month)] of table's monthly partitions, oldest first"""
+    pattern = re.compile(rf'^{table}_p(\d{{4}})_(\d{{2}})$')
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {'table': table}).scalars()
+    months = [(name, pattern.match(name)) for name in names]
+    return sorted(((name, datetime(int(m[1]), int(m[2]), 1)) for name, m in months if m), key=lambda p: p[1])
+
+
+def create_partition(conn, table, month):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    ))
+
+
+def convert_table(conn, table, months_ahead, now=None):
+    """Rewrite a plain votes or bookmarks table as a partitioned one with its keys
+    table and trigger. Returns the number of rows moved. Runs in the caller's transaction."""
+    global _partitioned
+    now = now or datetime.utcnow()
+    keys = PARTITIONED[table]
+    old = f'{table}_unpartitioned'
+    conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    # The id sequence would go with the old table
+    conn.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE"))
+    conn.execute(text(f"UPDATE {old} SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL"))
+    conn.execute(text(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL"))
+
+    month = month_start(conn.execute(text(f"SELECT min(created_at) FROM {old}")).scalar() or now)
+    last = add_months(month_start(now), months_ahead)
+    while month <= last:
+        create_partition(conn, table, month)
+        month = add_months(month, 1)
+    moved = conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}")).rowcount
+
+    KEY_TABLES[table].drop(conn, checkfirst=True)
+    KEY_TABLES[table].create(conn)
+    conn.execute(text(f"INSERT INTO {keys} (user_id, article_id, created_at) SELECT user_id, article_id, created_at FROM {old}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+    conn.execute(text(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id"))
+
+    # Built after the copy, which is much faster than maintaining them row by row
+    for statement in (
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_article_id_fkey FOREIGN KEY (article_id) REFERENCES articles (id)",
+        f"CREATE INDEX ix_{table}_user_article ON {table} (user_id, article_id)",
+        f"CREATE INDEX ix_{table}_article_id ON {table} (article_id)",
+        f"CREATE INDEX ix_{table}_created_at ON {table} (created_at)",
+        f"""CREATE OR REPLACE FUNCTION {table}_sync_keys() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM {keys} WHERE user_id = OLD.user_id AND article_id = OLD.article_id
+                        AND created_at = OLD.created_at;
+                ELSE
+                    INSERT INTO {keys} (user_id, article_id, created_at) VALUES (NEW.user_id, NEW.article_id, NEW.created_at);
+                END IF;
+                RETURN NULL;
+            END $$""",
+        f"CREATE TRIGGER {table}_sync_keys AFTER INSERT OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_sync_keys()",
+    ):
+        conn.execute(text(statement))
+    _partitioned = None
+    return moved
+
+
+def ensure_partitions(conn, table, months_ahead, now=None):
+    """Create the partitions for the current month and the next months_ahead; returns the new names"""
+    now = now or datetime.utcnow()
+    existing = {name for name, _ in partitions(conn, table)}
+    created = []
+    for n in range(months_ahead + 1):
+        month = add_months(month_start(now), n)
+        if partition_name(table, month) not in existing:
+            create_partition(conn, table, month)
+            created.append(partition_name(table, month))
+    return created
+
+
+def subtract_bias_scores(conn, partition):
+    """Take a votes partition's votes out of bias_scores, keyed as models.apply_vote_deltas keys them"""
+    conn.execute(text(f"""
+        UPDATE bias_scores b SET total_votes = b.total_votes - d.total, biased_votes = b.biased_votes - d.biased
+        FROM (
+            SELECT 'source' AS kind, coalesce(a.source_name, '') AS name,
+                   count(*) AS total, count(*) FILTER (WHERE v.is_biased) AS biased
+            FROM {partition} v JOIN articles a ON a.id = v.article_id
+            GROUP BY coalesce(a.source_name, '')
+            UNION ALL
+            SELECT 'author', a.author, count(*), count(*) FILTER (WHERE v.is_biased)
+            FROM {partition} v JOIN articles a ON a.id = v.article_id
+            WHERE a.author IS NOT NULL AND a.author <> ''
+            GROUP BY a.author
+        ) d
+        WHERE b.kind = d.kind AND b.name = d.name
+    """))
+
+
+def archive_partitions(conn, table, retain_months, drop=False, now=None):
+    """Detach (or drop) the partitions of months that ended more than retain_months
+    months ago and forget their keys; returns the partitions archived"""
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retain_months)
+    old = [name for name, month in partitions(conn, table) if add_months(month, 1) <= cutoff]
+    if not old:
+        return []
+    # DETACH locks the parent table; give up (until the next run) rather than queue votes behind it
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    for name in old:
+        if table == 'votes':
+            # No re-vote may change the month between counting it and detaching it
+            conn.execute(text(f"LOCK TABLE {name} IN EXCLUSIVE MODE"))
+            subtract_bias_scores(conn, name)
+        conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if drop:
+            conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"DELETE FROM {PARTITIONED[table]} WHERE created_at < :cutoff"), {'cutoff': cutoff})
+    return old
+
+
+def partition_status(conn, table):
+    """[(partition, estimated rows, total bytes)] for a partitioned table"""
+    return [
+        (name,) + tuple(conn.execute(text(
+            "SELECT c.reltuples::bigint, pg_total_relation_size(c.oid) FROM pg_class c WHERE c.oid = to_regclass(:name)"
+        ), {'name': name}).first())
+        for name, _ in partitions(conn, table)
+    ]
+
+
+def main():
+    import argparse
+    import os
+    import sys
+
+    os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+    from models import create_batch_app, db
+
+    parser = argparse.ArgumentParser(description='Monthly partitioning of votes and bookmarks (PostgreSQL)')
+    parser.add_argument('--convert', action='store_true', help='convert the plain tables (stop the API first)')
+    parser.add_argument('--maintain', action='store_true', help='create upcoming partitions and archive old ones')
+    parser.add_argument('--status', action='store_true', help='list the partitions with their sizes')
+    parser.add_argument('--tables', default=','.join(PARTITIONED), help='comma separated (default: votes,bookmarks)')
+    parser.add_argument('--months-ahead', type=int, default=int(os.environ.get('PARTITION_MONTHS_AHEAD', 3)))
+    parser.add_argument('--retain-months', type=int, default=int(os.environ.get('PARTITION_RETAIN_MONTHS', 0)),
+                        help='archive months older than this (default 0: keep everything)')
+    parser.add_argument('--archive', choices=('detach', 'drop'), default=os.environ.get('PARTITION_ARCHIVE', 'detach'))
+    args = parser.parse_args()
+    if not (args.convert or args.maintain or args.status):
+        parser.error('nothing to do: pass --convert, --maintain and/or --status')
+    tables = [t.strip() for t in args.tables.split(',')]
+    if any(t not in PARTITIONED for t in tables):
+        parser.error(f"--tables must be among {', '.join(PARTITIONED)}")
+
+    with create_batch_app().app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print("Partitioning needs PostgreSQL; nothing to do")
+            sys.exit(1 if args.convert else 0)
+        done = partitioned_tables(db.engine)
+        if args.convert:
+            for table in tables:
+                if table in done:
+                    print(f"✓ {table} is already partitioned")
+                    continue
+                with db.engine.begin() as conn:
+                    moved = convert_table(conn, table, args.months_ahead)
+                print(f"✓ {table} partitioned by month ({moved} rows moved); restart the API")
+            done = partitioned_tables(db.engine)
+        if args.maintain:
+            for table in tables:
+                if table not in done:
+                    continue
+                with db.engine.begin() as conn:
+                    created = ensure_partitions(conn, table, args.months_ahead)
+                    archived = archive_partitions(conn, table, args.retain_months, drop=args.archive == 'drop') \
+                        if args.retain_months > 0 else []
+                for name in created:
+                    print(f"✓ created {name}")
+                for name in archived:
+                    print(f"✓ {'dropped' if args.archive == 'drop' else 'detached'} {name}")
+        if args.status:
+            for table in tables:
+                if table not in done:
+                    print(f"{table}: not partitioned")
+                    continue
+                with db.engine.connect() as conn:
+                    print(f"{table}:")
+                    for name, rows, size in partition_status(conn, table):
+                        print(f"  {name:24s} {max(rows, 0):>12,d} rows {size / 1048576:>10.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
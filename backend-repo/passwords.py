@@ -0,0 +1,126 @@
+"""
+passwords.py
+Password hashing on a dedicated, bounded worker pool.
+
+Hashing is deliberately slow, so running it inline lets a burst of logins
+or registrations occupy every Flask worker thread. Instead, User.set_password
+and User.check_password hand the work to a small thread pool (bcrypt and
+argon2 both release the GIL while hashing). When more than
+PASSWORD_HASH_MAX_QUEUE hashes are in flight or waiting, new requests are
+refused with HashingOverloaded, which the auth endpoints turn into a 429.
+
+Configuration (environment):
+    PASSWORD_HASH_BACKEND    bcrypt (default) or argon2 (needs argon2-cffi)
+    BCRYPT_LOG_ROUNDS        bcrypt cost factor (default 12)
+    ARGON2_TIME_COST         argon2 iterations (default 3)
+    ARGON2_MEMORY_COST       argon2 memory in KiB (default 65536)
+    ARGON2_PARALLELISM       argon2 lanes (default 4)
+    PASSWORD_HASH_WORKERS    hashing threads per process (default 2)
+    PASSWORD_HASH_MAX_QUEUE  in-flight + queued hashes before shedding (default 16)
+
+Stored hashes are verified with whichever scheme produced them, and
+needs_rehash() reports hashes made with another backend or other cost
+parameters so the login endpoint can upgrade them transparently.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; the client should retry later"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Too many authentication requests, please retry shortly")
+        self.retry_after = retry_after
+
+
+def _load_argon2():
+    try:
+        import argon2
+    except ImportError:
+        raise RuntimeError("argon2 password hashes need the argon2-cffi package: pip install argon2-cffi")
+    return argon2
+
+
+class PasswordHasher:
+
+    def __init__(self, backend='bcrypt', bcrypt_rounds=12, argon2_params=None, workers=2, max_queue=16):
+        if backend not in ('bcrypt', 'argon2'):
+            raise ValueError(f"Unknown password hash backend: {backend}")
+        self.backend = backend
+        self.bcrypt_rounds = bcrypt_rounds
+        self._argon2 = None
+        if backend == 'argon2':
+            argon2 = _load_argon2()
+            self._argon2 = argon2.PasswordHasher(**(argon2_params or {}))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_queue)
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            backend=env('PASSWORD_HASH_BACKEND', 'bcrypt').strip().lower(),
+            bcrypt_rounds=int(env('BCRYPT_LOG_ROUNDS', 12)),
+            argon2_params={
+                'time_cost': int(env('ARGON2_TIME_COST', 3)),
+                'memory_cost': int(env('ARGON2_MEMORY_COST', 65536)),
+                'parallelism': int(env('ARGON2_PARALLELISM', 4)),
+            },
+            workers=int(env('PASSWORD_HASH_WORKERS', 2)),
+            max_queue=int(env('PASSWORD_HASH_MAX_QUEUE', 16)),
+        )
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingOverloaded()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(self._hash, password)
+
+    def verify(self, password_hash, password):
+        if not password_hash or password is None:
+            return False
+        return self._run(self._verify, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        if password_hash.startswith('$argon2'):
+            return self.backend != 'argon2' or self._argon2.check_needs_rehash(password_hash)
+        if self.backend != 'bcrypt':
+            return True
+        try:
+            return int(password_hash.split('$')[2]) != self.bcrypt_rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _hash(self, password):
+        if self.backend == 'argon2':
+            return self._argon2.hash(password)
+        return bcrypt.hashpw(_bcrypt_bytes(password), bcrypt.gensalt(self.bcrypt_rounds)).decode('utf-8')
+
+    def _verify(self, password_hash, password):
+        if password_hash.startswith('$argon2'):
+            argon2 = _load_argon2()
+            hasher = self._argon2 or argon2.PasswordHasher()
+            try:
+                return hasher.verify(password_hash, password)
+            except argon2.exceptions.VerificationError:
+                return False
+        return bcrypt.checkpw(_bcrypt_bytes(password), password_hash.encode('utf-8'))
+
+
+def _bcrypt_bytes(password):
+    # bcrypt only uses the first 72 bytes; older bcrypt releases truncated
+    # silently and newer ones raise, so truncate to keep existing hashes valid
+    return password.encode('utf-8')[:72]
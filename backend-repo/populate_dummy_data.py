@@ -4,11 +4,23 @@ Populates the NETRA database with dummy users, votes, and bookmarks
 for demonstration purposes.
 
 Run with: python populate_dummy_data.py
+
+For large, reproducible load-test datasets use the bulk generator, which
+needs NumPy (pip install numpy):
+    python populate_dummy_data.py --bulk --users 100000 --votes-per-user 50 150 --seed 42
 """
 
+import argparse
+import csv
+import io
+import os
 import random
 from datetime import datetime, timedelta
-from app import app, db, User, Article, Vote, Bookmark
+
+# Batch jobs use a small pool and no statement timeout (see database.py)
+os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+
+from models import create_batch_app, db, User, Article, Vote, Bookmark, rebuild_bias_scores, rebuild_activity_buckets
 
 # Configuration
 NUM_DUMMY_USERS = 50
@@ -275,6 +287,116 @@ def add_votes_to_existing_users():
     print(f"  Added {added_votes} votes and {added_bookmarks} bookmarks to existing users")
 
 
+def sample_user_articles(rng, counts, num_articles):
+    """Sample articles without replacement for every user at once.
+
+    counts[u] is how many distinct articles user u needs. Returns parallel
+    (user_index, article_index) arrays. Pairs are drawn with replacement in
+    one vectorized batch, duplicates are dropped, and only the users left
+    short are topped up, so the loop converges in a few rounds.
+    """
+    import numpy as np
+
+    counts = np.minimum(counts, num_articles)
+    users = np.empty(0, dtype=np.int64)
+    articles = np.empty(0, dtype=np.int64)
+    missing = counts.copy()
+    while missing.sum() > 0:
+        new_users = np.repeat(np.arange(len(counts)), missing)
+        new_articles = rng.integers(0, num_articles, size=len(new_users))
+        users = np.concatenate([users, new_users])
+        articles = np.concatenate([articles, new_articles])
+        keys, first = np.unique(users * num_articles + articles, return_index=True)
+        users, articles = users[first], articles[first]
+        # np.unique sorts by key, i.e. by user, so trim each user's surplus
+        have = np.bincount(users, minlength=len(counts))
+        rank = np.arange(len(users)) - np.repeat(np.cumsum(have) - have, have)
+        keep = rank < counts[users]
+        users, articles = users[keep], articles[keep]
+        missing = counts - np.bincount(users, minlength=len(counts))
+    return users, articles
+
+
+def bulk_insert(table, columns, rows):
+    """Insert rows (a list of tuples) with COPY on PostgreSQL, executemany elsewhere"""
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        raw = db.session.connection().connection.dbapi_connection
+        with raw.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    else:
+        db.session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def bulk_populate(num_users, votes_range, bookmarks_range, seed=42, chunk_size=500000):
+    """Vectorized generator for large demo/load-test datasets"""
+    try:
+        import numpy as np
+    except ImportError:
+        print("\n❌ Bulk mode needs NumPy: pip install numpy")
+        return
+
+    rng = np.random.default_rng(seed)
+    now = np.datetime64(datetime.utcnow(), 'us')
+
+    articles = db.session.query(Article.id, Article.source_name).order_by(Article.id).all()
+    if not articles:
+        print("\n❌ No articles found in database! Load articles first.")
+        return
+    article_ids = np.array([a.id for a in articles], dtype=np.int64)
+    source_names = sorted({a.source_name or '' for a in articles})
+    source_index = {name: i for i, name in enumerate(source_names)}
+    article_source = np.array([source_index[a.source_name or ''] for a in articles], dtype=np.int64)
+    # Some sources tend to be voted more biased, others less
+    source_tendency = rng.uniform(0.25, 0.75, size=len(source_names))
+
+    def timestamps(count, days):
+        offsets = rng.integers(0, days * 86400 * 10**6, size=count).astype('timedelta64[us]')
+        return (now - offsets).tolist()
+
+    print(f"\n📝 Creating {num_users} users...")
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    template = User()
+    template.set_password("demo123")  # one hash shared by every bulk user
+    firsts = rng.choice(FIRST_NAMES, size=num_users)
+    lasts = rng.choice(LAST_NAMES, size=num_users)
+    user_ids = np.arange(first_id, first_id + num_users)
+    user_rows = [
+        (int(uid), f"{f.lower()}.{l.lower()}.{uid}", f"{f.lower()}.{l.lower()}.{uid}@demo.netra", template.password_hash, created)
+        for uid, f, l, created in zip(user_ids, firsts, lasts, timestamps(num_users, 90))
+    ]
+    for start in range(0, len(user_rows), chunk_size):
+        bulk_insert(User.__table__, ['id', 'username', 'email', 'password_hash', 'created_at'], user_rows[start:start + chunk_size])
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT MAX(id) FROM users))"))
+    db.session.commit()
+
+    print("🗳️  Creating votes...")
+    vote_counts = rng.integers(votes_range[0], votes_range[1] + 1, size=num_users)
+    users, picks = sample_user_articles(rng, vote_counts, len(article_ids))
+    variation = rng.uniform(-0.2, 0.2, size=len(users))
+    is_biased = rng.random(len(users)) < source_tendency[article_source[picks]] + variation
+    vote_rows = list(zip(user_ids[users].tolist(), article_ids[picks].tolist(), is_biased.tolist(), timestamps(len(users), 45)))
+    for start in range(0, len(vote_rows), chunk_size):
+        bulk_insert(Vote.__table__, ['user_id', 'article_id', 'is_biased', 'created_at'], vote_rows[start:start + chunk_size])
+        db.session.commit()
+        print(f"  Created {min(start + chunk_size, len(vote_rows))} votes so far...")
+
+    print("🔖 Creating bookmarks...")
+    bookmark_counts = rng.integers(bookmarks_range[0], bookmarks_range[1] + 1, size=num_users)
+    users, picks = sample_user_articles(rng, bookmark_counts, len(article_ids))
+    bookmark_rows = list(zip(user_ids[users].tolist(), article_ids[picks].tolist(), timestamps(len(users), 45)))
+    for start in range(0, len(bookmark_rows), chunk_size):
+        bulk_insert(Bookmark.__table__, ['user_id', 'article_id', 'created_at'], bookmark_rows[start:start + chunk_size])
+        db.session.commit()
+
+    print(f"✅ Created {num_users} users, {len(vote_rows)} votes and {len(bookmark_rows)} bookmarks (seed {seed})")
+
+
 def print_summary():
     """Print database summary"""
     print("\n" + "=" * 60)
@@ -355,5 +477,22 @@ def main():
 
 
 if __name__ == '__main__':
-    with app.app_context():
-        main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Populate NETRA with dummy users, votes and bookmarks')
+    parser.add_argument('--bulk', action='store_true', help='vectorized generator for large datasets (needs NumPy)')
+    parser.add_argument('--users', type=int, default=NUM_DUMMY_USERS, help='users to create in bulk mode')
+    parser.add_argument('--votes-per-user', type=int, nargs=2, default=VOTES_PER_USER_RANGE, metavar=('MIN', 'MAX'))
+    parser.add_argument('--bookmarks-per-user', type=int, nargs=2, default=BOOKMARKS_PER_USER_RANGE, metavar=('MIN', 'MAX'))
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed for bulk mode (default: 42)')
+    args = parser.parse_args()
+
+    with create_batch_app().app_context():
+        if args.bulk:
+            bulk_populate(args.users, args.votes_per_user, args.bookmarks_per_user, seed=args.seed)
+        else:
+            main()
+        # Votes were inserted directly, so recount the bias totals and activity buckets
+        rebuild_bias_scores()
+        rebuild_activity_buckets()
+        db.session.commit()
+        if args.bulk:
+            print_summary()
\ No newline at end of file
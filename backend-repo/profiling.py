@@ -0,0 +1,319 @@
+"""
+profiling.py
+Opt-in request profiling for the NETRA API.
+
+Enable with PROFILING_ENABLED=true. For every request it records the SQL
+statement count, total SQL time, the slowest statements, JSON
+serialization time, password hashing time and response size. Each
+response gets a Server-Timing header (visible in the browser devtools
+Network tab), and per-endpoint totals are served in Prometheus text format
+at GET /metrics.
+
+    PROFILING_SLOW_MS                log the slowest statements of requests
+                                     slower than this (default 500)
+    PROFILING_SAMPLER                true to run the sampling profiler
+    PROFILING_SAMPLE_INTERVAL_MS     sampling interval (default 5)
+    PROFILING_DUMP_PATH              folded-stack output (default profile.folded);
+                                     render with flamegraph.pl or speedscope
+
+Work a request hands to other threads (the concurrent stats scans) is
+counted in its profile through attach_profile; its SQL time is summed
+over those threads, so it can exceed the request's own duration.
+
+Metrics are kept per worker process, so scrape each worker separately.
+"""
+
+import atexit
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SLOWEST_KEPT = 3
+
+
+def _enabled(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# The profile of the request a worker thread runs part of (see attach_profile)
+_attached_profile = ContextVar('attached_profile', default=None)
+
+
+def _profile():
+    if has_request_context():
+        return g.get('_profile')
+    return _attached_profile.get()
+
+
+def current_profile():
+    """The current request's profile (None when profiling is off), to hand to attach_profile"""
+    return _profile()
+
+
+@contextmanager
+def attach_profile(profile):
+    """Count the queries and timed sections of the block, which runs on another
+    thread without a request context, in the profile of the request it works for"""
+    token = _attached_profile.set(profile)
+    try:
+        yield
+    finally:
+        _attached_profile.reset(token)
+
+
+@contextmanager
+def timed(section):
+    """Add the time spent in the block to the current request's profile"""
+    profile = _profile()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with profile['lock']:
+            profile['sections'][section] += time.perf_counter() - start
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that records how long serialization takes"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()[1]
+    profile = _profile()
+    if profile is None:
+        return
+    # Locked: the stats scans of one request run on several threads
+    with profile['lock']:
+        profile['queries'] += 1
+        profile['sql_seconds'] += elapsed
+        slowest = profile['slowest']
+        slowest.append((elapsed, statement))
+        slowest.sort(key=lambda item: item[0], reverse=True)
+        del slowest[SLOWEST_KEPT:]
+
+
+def _handle_error(context):
+    # A statement that raised never reaches after_cursor_execute: drop its start time,
+    # or the next statement on this pooled connection would be timed from it
+    starts = context.connection.info.get('_query_start') if context.connection is not None else None
+    if starts and starts[-1][0] is context.execution_context:
+        starts.pop()
+
+
+class MetricsRegistry:
+    """Per-endpoint counters exposed in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = defaultdict(lambda: {
+            'requests': 0, 'seconds': 0.0, 'queries': 0, 'sql_seconds': 0.0,
+            'serialize_seconds': 0.0, 'hash_seconds': 0.0, 'response_bytes': 0,
+            'buckets': [0] * len(DURATION_BUCKETS),
+        })
+
+    def record(self, endpoint, seconds, profile, response_bytes):
+        with self._lock:
+            m = self._endpoints[endpoint]
+            m['requests'] += 1
+            m['seconds'] += seconds
+            m['queries'] += profile['queries']
+            m['sql_seconds'] += profile['sql_seconds']
+            m['serialize_seconds'] += profile['sections']['serialize']
+            m['hash_seconds'] += profile['sections']['hash']
+            m['response_bytes'] += response_bytes
+            index = bisect.bisect_left(DURATION_BUCKETS, seconds)
+            if index < len(DURATION_BUCKETS):
+                m['buckets'][index] += 1
+
+    def render(self, extra_gauges=None):
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            snapshot = {k: dict(v, buckets=list(v['buckets'])) for k, v in self._endpoints.items()}
+
+        family('netra_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+        for endpoint, m in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, m['buckets']):
+                cumulative += count
+                lines.append(f'netra_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+            lines.append(f'netra_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {m["requests"]}')
+            lines.append(f'netra_request_duration_seconds_sum{{endpoint="{endpoint}"}} {m["seconds"]:.6f}')
+            lines.append(f'netra_request_duration_seconds_count{{endpoint="{endpoint}"}} {m["requests"]}')
+
+        counters = (
+            ('netra_sql_queries_total', 'queries', 'SQL statements executed'),
+            ('netra_sql_seconds_total', 'sql_seconds', 'Time spent in SQL statements'),
+            ('netra_serialize_seconds_total', 'serialize_seconds', 'Time spent encoding JSON'),
+            ('netra_password_hash_seconds_total', 'hash_seconds', 'Time spent waiting for password hashing'),
+            ('netra_response_bytes_total', 'response_bytes', 'Response body bytes'),
+        )
+        for name, key, help_text in counters:
+            family(name, 'counter', help_text)
+            for endpoint, m in sorted(snapshot.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}"}} {m[key]}')
+
+        for name, (help_text, value) in (extra_gauges or {}).items():
+            family(name, 'gauge', help_text)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class StackSampler:
+    """Samples the stacks of threads serving requests and aggregates them
+    as folded stacks ("frame;frame;frame count"), the flamegraph input format"""
+
+    def __init__(self, interval_ms=5, dump_path='profile.folded', dump_every=10):
+        self.interval = interval_ms / 1000.0
+        self.dump_path = dump_path
+        self.dump_every = dump_every
+        self.active = {}            # thread id -> endpoint
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._run, name='stack-sampler', daemon=True).start()
+        atexit.register(self.dump)
+
+    def _run(self):
+        last_dump = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, endpoint in list(self.active.items()):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        self.stacks[self._fold(endpoint, frame)] += 1
+            if time.monotonic() - last_dump >= self.dump_every:
+                self.dump()
+                last_dump = time.monotonic()
+
+    @staticmethod
+    def _fold(endpoint, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+            frame = frame.f_back
+        names.append(endpoint)
+        return ';'.join(reversed(names))
+
+    def dump(self):
+        with self._lock:
+            lines = [f'{stack} {count}' for stack, count in self.stacks.most_common()]
+        if not lines:
+            return
+        tmp_path = self.dump_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.dump_path)
+
+
+def _endpoint_label():
+    """The view function's name, without the blueprint prefix ("api.get_articles" is
+    "get_articles"), so metric labels do not depend on how routes are grouped"""
+    return (request.endpoint or 'unknown').rsplit('.', 1)[-1]
+
+
+def init_profiling(app, extra_gauges=None):
+    """Install the profiling hooks and /metrics on the app if PROFILING_ENABLED is set.
+
+    extra_gauges is a callable returning {metric_name: (help, value)} that
+    is added to /metrics (used for pool statistics).
+    """
+    if not _enabled('PROFILING_ENABLED'):
+        return None
+
+    registry = MetricsRegistry()
+    slow_seconds = int(os.environ.get('PROFILING_SLOW_MS', 500)) / 1000.0
+    sampler = None
+    if _enabled('PROFILING_SAMPLER'):
+        sampler = StackSampler(
+            interval_ms=int(os.environ.get('PROFILING_SAMPLE_INTERVAL_MS', 5)),
+            dump_path=os.environ.get('PROFILING_DUMP_PATH', 'profile.folded'),
+        )
+        sampler.start()
+
+    app.json = TimedJSONProvider(app)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_profile():
+        g._profile = {
+            'start': time.perf_counter(), 'queries': 0, 'sql_seconds': 0.0,
+            'slowest': [], 'sections': defaultdict(float), 'lock': threading.Lock(),
+        }
+        if sampler is not None:
+            sampler.active[threading.get_ident()] = _endpoint_label()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('_profile', None)
+        if sampler is not None:
+            sampler.active.pop(threading.get_ident(), None)
+        if profile is None:
+            return response
+        total = time.perf_counter() - profile['start']
+        size = 0 if response.direct_passthrough or response.is_streamed else response.calculate_content_length() or 0
+        timings = [
+            f'db;dur={profile["sql_seconds"] * 1000:.1f};desc="{profile["queries"]} queries"',
+            f'ser;dur={profile["sections"]["serialize"] * 1000:.1f}',
+        ]
+        if profile['sections']['hash']:
+            timings.append(f'hash;dur={profile["sections"]["hash"] * 1000:.1f}')
+        timings.append(f'total;dur={total * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        endpoint = _endpoint_label()
+        if endpoint != 'metrics':
+            registry.record(endpoint, total, profile, size)
+        if total >= slow_seconds:
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries (%.0f ms SQL). Slowest: %s",
+                request.method, request.path, total * 1000, profile['queries'], profile['sql_seconds'] * 1000,
+                ' | '.join(f'{elapsed * 1000:.1f} ms {" ".join(sql.split())[:200]}' for elapsed, sql in profile['slowest'])
+            )
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        body = registry.render(extra_gauges() if extra_gauges else None)
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    return registry
@@ -0,0 +1,195 @@
+"""
+ranking.py
+In-process "trending" index for the article feed.
+
+Every article has a hot score: the sum of its events (publication, votes,
+bookmarks), each weighted and decayed exponentially with a half-life of
+RANKING_HALF_LIFE_HOURS:
+
+    score(t) = sum(weight * 2 ** -((t - t_event) / half_life))
+
+Decay multiplies every score by the same factor, so it never changes the
+order. The index therefore stores each score scaled to a fixed epoch,
+weight * 2 ** ((t_event - epoch) / half_life). An event only touches its
+own article, and nothing is ever rescanned to apply decay. The top
+RANKING_TOP_N articles per category (and overall) are kept in sorted
+lists, so a page of the trending feed is a list slice.
+
+Each worker process has its own index. It is warmed from the database on
+first use and rebuilt every RANKING_REFRESH_SECONDS in the background,
+which also picks up new articles and events recorded by other workers.
+Between rebuilds it is updated from this worker's own votes and bookmarks
+(a changed vote counts as another vote until the next rebuild).
+
+Decay alone never reorders the lists, but between rebuilds they can be
+stale in three ways, each corrected by the next rebuild, so for at most
+RANKING_REFRESH_SECONDS plus the rebuild's duration:
+  * articles published more than RANKING_WINDOW_DAYS ago stay ranked;
+  * an article that lost events (a withdrawn bookmark) stays ahead of
+    articles that were cut from a full top-N list and now outrank it;
+  * new articles, and events handled by other workers, are missing.
+
+    RANKING_HALF_LIFE_HOURS   default 12
+    RANKING_ARTICLE_WEIGHT    weight of publication itself (default 2)
+    RANKING_VOTE_WEIGHT       default 1
+    RANKING_BOOKMARK_WEIGHT   default 3
+    RANKING_TOP_N             articles kept per category (default 1000)
+    RANKING_WINDOW_DAYS       only articles published this recently are ranked (default 7)
+    RANKING_REFRESH_SECONDS   rebuild interval (default 300)
+"""
+
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+ALL = 'all'
+
+
+class RankingIndex:
+    """Decayed hot scores with a bounded sorted top-N list per category"""
+
+    def __init__(self, half_life_hours=12, weights=None, top_n=1000, window_days=7, refresh_seconds=300):
+        self.rate = math.log(2) / (half_life_hours * 3600)
+        self.weights = {'article': 2.0, 'vote': 1.0, 'bookmark': 3.0, **(weights or {})}
+        self.top_n = top_n
+        self.window = timedelta(days=window_days)
+        self.refresh_seconds = refresh_seconds
+        self.epoch = datetime.utcnow()
+        self._scores = {}           # article_id -> (category, score scaled to epoch)
+        self._top = {}              # category -> [(-scaled score, article_id)], ascending
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self._warmed_at = None
+        self._building = False
+        self._replay = []
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            half_life_hours=float(env('RANKING_HALF_LIFE_HOURS', 12)),
+            weights={
+                'article': float(env('RANKING_ARTICLE_WEIGHT', 2)),
+                'vote': float(env('RANKING_VOTE_WEIGHT', 1)),
+                'bookmark': float(env('RANKING_BOOKMARK_WEIGHT', 3)),
+            },
+            top_n=int(env('RANKING_TOP_N', 1000)),
+            window_days=float(env('RANKING_WINDOW_DAYS', 7)),
+            refresh_seconds=int(env('RANKING_REFRESH_SECONDS', 300)),
+        )
+
+    def _scaled(self, kind, when, epoch):
+        return self.weights[kind] * math.exp(self.rate * (when - epoch).total_seconds())
+
+    def _apply(self, scores, tops, article_id, category, delta):
+        old = scores.get(article_id)
+        old_key = old[1] if old else None
+        new_key = (old_key or 0.0) + delta
+        scores[article_id] = (category, new_key)
+        for name in (category, ALL):
+            top = tops.setdefault(name, [])
+            if old_key is not None:
+                i = bisect.bisect_left(top, (-old_key, article_id))
+                if i < len(top) and top[i] == (-old_key, article_id):
+                    del top[i]
+            # An article that fell off a full list comes back once it outranks the last entry
+            if len(top) < self.top_n or (-new_key, article_id) < top[-1]:
+                bisect.insort(top, (-new_key, article_id))
+                del top[self.top_n:]
+
+    def record(self, article_id, category, kind, when=None, sign=1):
+        """Add (sign=1) or withdraw (sign=-1) one vote or bookmark event.
+
+        category may be None when the caller does not have the article at
+        hand; events for articles the index has not seen are then left to
+        the next rebuild.
+        """
+        when = when or datetime.utcnow()
+        with self._lock:
+            if self._building:
+                self._replay.append((article_id, category, kind, when, sign))
+            if self._warmed_at is None:
+                return
+            known = self._scores.get(article_id)
+            if known is None and category is None:
+                return
+            # An article missing from the last snapshot starts with just this
+            # event; its publication weight arrives with the next rebuild
+            category = category or known[0]
+            self._apply(self._scores, self._top, article_id, category, sign * self._scaled(kind, when, self.epoch))
+
+    def category_of(self, article_id):
+        with self._lock:
+            entry = self._scores.get(article_id)
+        return entry[0] if entry else None
+
+    def page(self, category, offset, limit):
+        """([(article_id, current score)], number of ranked articles) for one page"""
+        with self._lock:
+            decay = math.exp(-self.rate * (datetime.utcnow() - self.epoch).total_seconds())
+            top = self._top.get(category or ALL, [])
+            return [(article_id, -key * decay) for key, article_id in top[offset:offset + limit]], len(top)
+
+    def ranked_ids(self, category):
+        with self._lock:
+            return [article_id for _, article_id in self._top.get(category or ALL, [])]
+
+    def rebuild(self, load_snapshot):
+        """Recompute the index from load_snapshot(since) -> (articles, events).
+
+        articles yields (id, category, created_at) for articles published
+        since `since`; events yields (article_id, kind, created_at).
+        """
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._replay = []
+        started = time.perf_counter()
+        try:
+            epoch = datetime.utcnow()
+            articles, events = load_snapshot(epoch - self.window)
+            categories, totals = {}, {}
+            for article_id, category, created_at in articles:
+                categories[article_id] = category
+                totals[article_id] = self._scaled('article', created_at or epoch, epoch)
+            for article_id, kind, created_at in events:
+                if article_id in totals:
+                    totals[article_id] += self._scaled(kind, created_at or epoch, epoch)
+            scores = {article_id: (categories[article_id], total) for article_id, total in totals.items()}
+            tops = {}
+            for article_id, (category, total) in scores.items():
+                tops.setdefault(category, []).append((-total, article_id))
+            tops[ALL] = [entry for top in tops.values() for entry in top]
+            for name, top in tops.items():
+                top.sort()
+                del top[self.top_n:]
+            with self._lock:
+                self.epoch, self._scores, self._top = epoch, scores, tops
+                self._warmed_at = time.monotonic()
+                replay, self._replay = self._replay, []
+                self._building = False
+        except Exception:
+            with self._lock:
+                self._building = False
+            raise
+        # Events recorded while the snapshot was being read; an event that
+        # also made it into the snapshot is counted twice until the next rebuild
+        for event in replay:
+            self.record(*event)
+        logger.info("Ranking index rebuilt: %d articles in %.2fs", len(totals), time.perf_counter() - started)
+
+    def ensure_fresh(self, load_snapshot, run_in_background):
+        """Warm synchronously on first use; afterwards rebuild in the background when stale"""
+        if self._warmed_at is None:
+            with self._warm_lock:
+                if self._warmed_at is None:
+                    self.rebuild(load_snapshot)
+        elif time.monotonic() - self._warmed_at >= self.refresh_seconds and not self._building:
+            run_in_background(lambda: self.rebuild(load_snapshot))
@@ -0,0 +1,231 @@
+"""
+ratelimit.py
+Token-bucket rate limiting for the endpoints a single client can abuse.
+
+A feed search is a scan of the articles table, a login is a bcrypt hash
+and a vote is a write, so one client repeating any of them can saturate
+the database. Each request to a limited endpoint takes `cost` tokens
+from a bucket keyed by the user (or the client IP for anonymous
+requests, and always the IP for login and registration). Buckets refill
+at a steady rate up to a burst size. A request that finds too few
+tokens is answered 429 with Retry-After from a before_request hook,
+before the view runs and without touching the database.
+
+Which bucket and cost a request takes is decided by the app (see
+rate_limit_rule in app.py). Buckets and costs are configured as
+
+    RATE_LIMIT_ENABLED        default 1
+    RATE_LIMIT_READ           tokens per second/burst (default 10/40)
+    RATE_LIMIT_WRITE          default 2/20
+    RATE_LIMIT_AUTH           default 0.2/10
+    RATE_LIMIT_COST_SEARCH    tokens a feed search takes (default 5)
+    RATE_LIMIT_COST_STATS     tokens a stats request takes (default 3)
+    RATE_LIMIT_STORE          memory (default) or redis
+    RATE_LIMIT_REDIS_URL      default redis://localhost:6379/0
+    RATE_LIMIT_TRUSTED_PROXIES  reverse proxies in front of the app whose
+                              X-Forwarded-For entries are trusted (default 0)
+
+The memory store keeps buckets per worker process, so a client spread
+over N workers gets up to N times the configured rate. The redis store
+(needs the redis package) shares the buckets between workers and hosts;
+if Redis cannot be reached requests are let through rather than failed.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import jsonify, request
+
+try:
+    import redis
+except ImportError:  # optional: only needed for RATE_LIMIT_STORE=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+Limit = namedtuple('Limit', 'rate burst')
+
+DEFAULT_LIMITS = {'read': '10/40', 'write': '2/20', 'auth': '0.2/10'}
+DEFAULT_COSTS = {'search': 5, 'stats': 3}
+
+
+def parse_limit(value):
+    """'RATE/BURST' (tokens per second / bucket size) as a Limit"""
+    rate, _, burst = value.partition('/')
+    limit = Limit(float(rate), float(burst or rate))
+    if limit.rate <= 0 or limit.burst <= 0:
+        raise ValueError(f"Rate limit must be positive: {value}")
+    return limit
+
+
+# Set in the WSGI environ of a request that was already admitted (asgi.py checks on a thread)
+ADMITTED = 'ratelimit.admitted'
+
+
+class MemoryStore:
+    """Buckets in this process, least recently used ones dropped beyond maxsize"""
+
+    blocking = False
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()     # key -> (tokens, monotonic time of last update)
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, limit):
+        """(allowed, seconds until cost tokens are available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # A dropped bucket comes back full, so only the idlest clients gain anything
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+
+# Refill and take in one round trip, on Redis' clock so every worker agrees on the time
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local cost, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisStore:
+    """Buckets in Redis, shared by every worker; fails open when Redis is unavailable"""
+
+    # Every check is a network round trip
+    blocking = True
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+        self._last_error_log = 0.0
+
+    def take(self, key, cost, limit):
+        try:
+            wait = float(self._take(keys=[self.prefix + key], args=[cost, limit.rate, limit.burst]))
+        except redis.RedisError as e:
+            if time.monotonic() - self._last_error_log > 60:
+                self._last_error_log = time.monotonic()
+                logger.warning("Rate limit store unavailable, not limiting: %s", e)
+            return True, 0.0
+        return wait == 0, wait
+
+
+class RateLimiter:
+
+    def __init__(self, store, limits, costs=None, trusted_proxies=0, rule=None, user_id=None):
+        self.store = store
+        self.limits = limits
+        self.costs = dict(costs or {})
+        self.trusted_proxies = trusted_proxies
+        self.rule = rule
+        self.user_id = user_id
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a limiter from the environment, or None when RATE_LIMIT_ENABLED=0"""
+        env = os.environ.get
+        if env('RATE_LIMIT_ENABLED', '1') == '0':
+            return None
+        store_name = env('RATE_LIMIT_STORE', 'memory')
+        if store_name == 'redis':
+            if redis is None:
+                raise RuntimeError("RATE_LIMIT_STORE=redis needs the redis package: pip install redis")
+            store = RedisStore(redis.Redis.from_url(env('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0'),
+                                                    socket_timeout=0.05, socket_connect_timeout=0.05))
+        elif store_name == 'memory':
+            store = MemoryStore()
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_STORE: {store_name}")
+        return cls(
+            store,
+            limits={name: parse_limit(env(f'RATE_LIMIT_{name.upper()}', default))
+                    for name, default in DEFAULT_LIMITS.items()},
+            costs={name: float(env(f'RATE_LIMIT_COST_{name.upper()}', default))
+                   for name, default in DEFAULT_COSTS.items()},
+            trusted_proxies=int(env('RATE_LIMIT_TRUSTED_PROXIES', 0)),
+        )
+
+    def client_ip(self):
+        """The client address, looking through RATE_LIMIT_TRUSTED_PROXIES proxies"""
+        if self.trusted_proxies:
+            forwarded = [a.strip() for a in request.headers.get('X-Forwarded-For', '').split(',') if a.strip()]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        return request.remote_addr or 'unknown'
+
+    def check(self, bucket, cost, identity):
+        """Seconds the client must wait, or 0 if the request may proceed"""
+        limit = self.limits[bucket]
+        # A cost above the burst could never be paid
+        cost = min(self.costs.get(cost, 1) if isinstance(cost, str) else cost, limit.burst)
+        allowed, wait = self.store.take(f'{bucket}:{identity}', cost, limit)
+        if allowed:
+            return 0
+        self.rejected += 1
+        return max(1, math.ceil(wait))
+
+    def admit(self):
+        """None if the current request may proceed, else its 429 response"""
+        if request.method == 'OPTIONS':
+            return None
+        matched = self.rule()
+        if matched is None:
+            return None
+        bucket, cost = matched
+        identity = self.user_id() if bucket != 'auth' else None
+        identity = f'user:{identity}' if identity is not None else f'ip:{self.client_ip()}'
+        retry_after = self.check(bucket, cost, identity)
+        if not retry_after:
+            return None
+        response = jsonify({'error': 'Too many requests, please retry later'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+
+def init_rate_limit(app, rule, user_id):
+    """Reject over-limit requests in a before_request hook unless RATE_LIMIT_ENABLED=0.
+
+    rule() returns the (bucket, cost) of the current request, or None for
+    endpoints that are not limited; cost is a number or a RATE_LIMIT_COST_*
+    name. user_id() returns the authenticated user's id or None.
+    """
+    limiter = RateLimiter.from_env()
+    if limiter is None:
+        return None
+    limiter.rule, limiter.user_id = rule, user_id
+
+    @app.before_request
+    def admit_request():
+        if request.environ.get(ADMITTED):
+            return None
+        return limiter.admit()
+
+    app.extensions['rate_limiter'] = limiter
+    return limiter
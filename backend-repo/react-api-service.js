@@ -219,18 +219,45 @@ export const statsAPI = {
     return response.data;
   },
 
-  // Fetch all stats at once (for dashboard)
+  // Fetch all stats at once (for dashboard): one request, one set of queries
+  // { overview, voting, bookmarks, sources, categories, authors, engagement }
   getAllStats: async () => {
-    const [overview, voting, bookmarks, sources, categories, authors, engagement] = await Promise.all([
-      statsAPI.getOverview(),
-      statsAPI.getVotingStats(),
-      statsAPI.getBookmarkStats(),
-      statsAPI.getSourceStats(),
-      statsAPI.getCategoryStats(),
-      statsAPI.getAuthorStats(),
-      statsAPI.getEngagementStats(),
-    ]);
-    return { overview, voting, bookmarks, sources, categories, authors, engagement };
+    const response = await api.get('/stats/all');
+    return response.data;
+  },
+};
+
+// ==================== Sparse fieldsets ====================
+
+// The article fields a feed card renders, sent as ?fields= so the backend
+// skips everything else (and the per-article lookups behind it)
+export const FEED_FIELDS = [
+  'id', 'headline', 'author', 'category', 'featured_image', 'featured_image_proxy',
+  'source_logo', 'source_logo_proxy', 'source_name', 'publish_date', 'vote_stats', 'is_bookmarked',
+].join(',');
+
+// ==================== Images ====================
+
+// Absolute URL for a backend image path (featured_image_proxy / source_logo_proxy),
+// falling back to the original third-party URL when there is no cached copy
+export const imageUrl = (proxyPath, fallback) =>
+  proxyPath ? new URL(proxyPath, API_BASE_URL).href : fallback;
+
+// ==================== Live Updates ====================
+
+// Opens the server-sent events stream for the given article ids and categories.
+// onVotes({article_id, vote_stats}) and onArticles({category, count, latest_id})
+// are called as updates arrive. Returns a function that closes the stream.
+export const streamAPI = {
+  subscribe: ({ articleIds = [], categories = [] }, { onVotes, onArticles } = {}) => {
+    if (typeof EventSource === 'undefined') return () => {};
+    const params = new URLSearchParams();
+    if (articleIds.length) params.set('articles', articleIds.join(','));
+    if (categories.length) params.set('categories', categories.join(','));
+    const source = new EventSource(`${API_BASE_URL}/stream?${params}`);
+    if (onVotes) source.addEventListener('votes', (e) => onVotes(JSON.parse(e.data)));
+    if (onArticles) source.addEventListener('articles', (e) => onArticles(JSON.parse(e.data)));
+    return () => source.close();
   },
 };
 
@@ -7,11 +7,7 @@ from datetime import datetime
 import subprocess
 import signal
 
-# Configure loggingdef signal_handler(signum, frame):
-    """Handle shutdown signals gracefully"""
-    global running
-    logger.info("Shutdown signal received. Finishing current task and exiting...")
-    running = False
+# Configure logging
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -45,8 +41,12 @@ def run_data_loader():
     
     try:
         # Run the script as a subprocess
+        # The loader is a batch process: small pool, no statement timeout
+        env = dict(os.environ)
+        env.setdefault('DB_PROCESS_ROLE', 'batch')
         result = subprocess.run(
             [sys.executable, script_path],
+            env=env,
             capture_output=True,
             text=True,
             timeout=600  # 10 minute timeout
@@ -77,6 +77,44 @@ def run_data_loader():
         return False
 
 
+def run_partition_maintenance():
+    """Create upcoming vote/bookmark partitions and archive old ones (partitions.py --maintain).
+    Does nothing unless the tables have been partitioned."""
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'partitions.py')
+    env = dict(os.environ)
+    env.setdefault('DB_PROCESS_ROLE', 'batch')
+    try:
+        result = subprocess.run(
+            [sys.executable, script_path, '--maintain'],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        if result.stdout:
+            for line in result.stdout.strip().split('\n'):
+                logger.info(f"[PARTITIONS] {line}")
+        if result.stderr:
+            for line in result.stderr.strip().split('\n'):
+                logger.warning(f"[PARTITIONS ERROR] {line}")
+        if result.returncode != 0:
+            logger.error(f"Partition maintenance failed with return code: {result.returncode}")
+        return result.returncode == 0
+    except subprocess.TimeoutExpired:
+        logger.error("Partition maintenance timed out after 5 minutes")
+        return False
+    except Exception as e:
+        logger.error(f"Error running partition maintenance: {str(e)}")
+        return False
+
+
+def run_cycle():
+    """One scheduled run: load new articles, then keep the partitions ahead of time"""
+    success = run_data_loader()
+    run_partition_maintenance()
+    return success
+
+
 def run_scheduler(interval_minutes):
     """Run the scheduler with the specified interval"""
     global running
@@ -93,7 +131,7 @@ def run_scheduler(interval_minutes):
     
     # Run immediately on start
     logger.info("Running initial data load...")
-    run_data_loader()
+    run_cycle()
     
     # Calculate interval in seconds
     interval_seconds = interval_minutes * 60
@@ -108,7 +146,7 @@ def run_scheduler(interval_minutes):
             
             # Check if it's time to run again
             if current_time - last_run >= interval_seconds:
-                run_data_loader()
+                run_cycle()
                 last_run = current_time
                 if running:
                     logger.info(f"\nNext run scheduled in {interval_minutes} minutes...")
@@ -151,7 +189,7 @@ def main():
     # Run once mode
     if args.once:
         logger.info("Running in single-run mode...")
-        success = run_data_loader()
+        success = run_cycle()
         sys.exit(0 if success else 1)
     
     run_scheduler(args.interval)
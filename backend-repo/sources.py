@@ -0,0 +1,103 @@
+"""
+sources.py
+Canonical news sources.
+
+Scraped articles name their source in free text, and the same outlet
+turns up under several spellings ("The Times of India" and "Times of
+India", "IndianExpress" and "The Indian Express"). Each outlet gets one
+row in the sources table (models.Source), holding its canonical name, its
+logo and the other spellings seen for it (aliases). Spellings are matched
+by source_key(): lower case, without a leading "The", and with only
+letters and digits kept. Articles and related articles point at their
+source through an indexed source_id. The source filter on the feed is
+then an IN over integers, and logos are stored once per source.
+
+Every worker keeps a SourceDirectory of the whole table in memory (it is
+small) and reloads it every SOURCE_CACHE_TTL_SECONDS (default 300).
+
+load_data.py resolves sources as it inserts. Backfill an existing
+database, or add a spelling by hand, with:
+    python sources.py --backfill
+    python sources.py --alias "Times of India=TOI"
+"""
+
+import json
+import re
+import time
+
+
+def source_key(name):
+    """Matching key for a source spelling; '' for a missing name"""
+    key = (name or '').strip().lower()
+    key = re.sub(r'^the\s+', '', key)
+    return re.sub(r'[\W_]+', '', key)
+
+
+def alias_list(aliases):
+    return json.loads(aliases) if aliases else []
+
+
+class SourceDirectory:
+    """In-memory view of the sources table: spellings to ids, ids to names and logos"""
+
+    def __init__(self, rows=()):
+        self.names = {}
+        self.logos = {}
+        self.spellings = {}
+        self._by_key = {}
+        self.loaded_at = time.monotonic()
+        for row in rows:
+            self.add(*row)
+
+    def add(self, source_id, name, logo_url=None, aliases=None):
+        """Add or refresh one source; aliases is the column's JSON text"""
+        self.names[source_id] = name
+        self.logos[source_id] = logo_url
+        self.spellings[source_id] = {name, *alias_list(aliases)}
+        for spelling in self.spellings[source_id]:
+            self._by_key[source_key(spelling)] = source_id
+
+    def lookup(self, name):
+        """The id of the source `name` is a spelling of, or None"""
+        return self._by_key.get(source_key(name))
+
+    def knows(self, source_id, name):
+        return name in self.spellings.get(source_id, ())
+
+    def matching(self, term):
+        """Ids of sources with a spelling that contains term, case-insensitively
+        (what the old ILIKE '%term%' matched), plus the source term itself names"""
+        needle = term.strip().lower()
+        if not needle:
+            return set()
+        ids = {source_id for source_id, spellings in self.spellings.items()
+               if any(needle in spelling.lower() for spelling in spellings)}
+        exact = self.lookup(term)
+        return ids | {exact} if exact is not None else ids
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    os.environ.setdefault('DB_PROCESS_ROLE', 'batch')
+    from models import create_batch_app, db, add_source_alias, backfill_sources
+
+    parser = argparse.ArgumentParser(description='Maintain the canonical sources table')
+    parser.add_argument('--backfill', action='store_true', help='resolve source_id for rows that have none')
+    parser.add_argument('--alias', action='append', default=[], metavar='NAME=ALIAS',
+                        help='record ALIAS as another spelling of source NAME (repeatable)')
+    args = parser.parse_args()
+    if not args.backfill and not args.alias:
+        parser.error('nothing to do: pass --backfill and/or --alias')
+
+    with create_batch_app().app_context():
+        db.create_all()
+        for pair in args.alias:
+            name, _, alias = pair.partition('=')
+            add_source_alias(name.strip(), alias.strip())
+            print(f"✓ {alias.strip()} → {name.strip()}")
+        if args.backfill:
+            sources, articles, related = backfill_sources()
+            print(f"✓ {sources} sources; source_id set on {articles} articles and {related} related articles")
+        db.session.commit()
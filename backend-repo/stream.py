@@ -0,0 +1,314 @@
+"""
+stream.py
+Server-sent events for live vote counts and new articles.
+
+Clients open GET /api/stream?articles=1,2,3&categories=sports,world and
+receive two kinds of events instead of re-polling the API:
+
+    event: votes      data: {"article_id": 1, "vote_stats": {...}}
+    event: articles   data: {"category": "sports", "count": 3, "latest_id": 812}
+
+Votes cast through this worker are published as soon as they are
+committed. Everything else (votes taken by other workers, articles added
+by load_data.py) is picked up by one poll every STREAM_POLL_SECONDS: the
+vote counts of the articles someone is watching, plus the articles with
+an id above the last one seen. That is two indexed queries per worker,
+however many clients are connected, where each client used to refetch
+whole pages.
+
+Updates are coalesced per article: the hub sends the latest stats of an
+article at most STREAM_MAX_UPDATES_PER_SECOND times a second (default 2),
+and a client that reads slowly only ever has the latest state of each
+article and category pending, never a backlog.
+
+Streaming is off unless STREAM_ENABLED=1. Under a WSGI server each open
+stream holds a worker thread while it is connected, so it needs
+gunicorn's threaded workers (--worker-class gthread --threads N); a sync
+worker (no wsgi.multithread) answers 503, and the client keeps the
+counts it loaded. asgi.py iterates the same EventStream with `async for`
+instead, so there a stream waits on the event loop and holds no thread.
+At most STREAM_MAX_SUBSCRIBERS (default 16) streams are served per
+worker, the rest get 503 with Retry-After; under WSGI keep it well below
+--threads so that streams cannot take every thread from the API. Streams are
+closed after STREAM_MAX_SECONDS (default 300) and the browser's
+EventSource reconnects on its own, which spreads long-lived connections
+across workers after a deploy.
+
+    STREAM_ENABLED                 default 0
+    STREAM_POLL_SECONDS            default 2
+    STREAM_MAX_UPDATES_PER_SECOND  default 2
+    STREAM_HEARTBEAT_SECONDS       default 15
+    STREAM_MAX_SECONDS             default 300
+    STREAM_MAX_SUBSCRIBERS         default 16
+    STREAM_MAX_ARTICLES            articles one stream may watch (default 200)
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StreamFull(Exception):
+    """The worker already serves STREAM_MAX_SUBSCRIBERS streams"""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many open streams, try again later")
+        self.retry_after = retry_after
+
+
+class Subscription:
+    """One client's stream: what it watches and the events waiting to be sent.
+
+    Pending events are keyed by (event, key), so a newer state replaces an
+    unsent older one.
+    """
+
+    def __init__(self, article_ids, categories):
+        self.article_ids = frozenset(article_ids)
+        self.categories = frozenset(categories) if categories else None   # None: every category
+        self._pending = {}
+        self._ready = threading.Condition()
+        self._wake = None           # wakes a take_async() waiting on an event loop
+        self.closed = False
+
+    def wants_category(self, category):
+        return self.categories is None or category in self.categories
+
+    def put(self, event, key, data):
+        with self._ready:
+            self._pending[(event, key)] = data
+            self._ready.notify()
+            wake, self._wake = self._wake, None
+        if wake is not None:
+            wake()
+
+    def take(self, timeout):
+        """Pending (event, data) pairs, waiting up to timeout seconds for one"""
+        with self._ready:
+            if not self._pending and not self.closed:
+                self._ready.wait(timeout)
+            pending, self._pending = self._pending, {}
+        return [(event, data) for (event, _), data in pending.items()]
+
+    async def take_async(self, timeout):
+        """take() for a coroutine: waits on the running event loop instead of a thread"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        with self._ready:
+            waiting = not self._pending and not self.closed
+            if waiting:
+                self._wake = lambda: wake_loop(loop, ready.set)
+        if waiting:
+            try:
+                await asyncio.wait_for(ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        with self._ready:
+            self._wake = None
+            pending, self._pending = self._pending, {}
+        return [(event, data) for (event, _), data in pending.items()]
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+            wake, self._wake = self._wake, None
+        if wake is not None:
+            wake()
+
+
+def wake_loop(loop, callback):
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        pass    # the loop has already closed
+
+
+class StreamHub:
+    """Fans vote and new-article updates out to this worker's open streams"""
+
+    def __init__(self, poll_fn, poll_seconds=2.0, max_rate=2.0, heartbeat_seconds=15.0,
+                 max_seconds=300.0, max_subscribers=16, max_articles=200):
+        self.poll_fn = poll_fn
+        self.poll_seconds = poll_seconds
+        self.interval = 1.0 / max_rate
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_seconds = max_seconds
+        self.max_subscribers = max_subscribers
+        self.max_articles = max_articles
+        self._subscribers = set()
+        self._dirty = {}            # article_id -> vote stats not yet sent
+        self._sent = {}             # article_id -> vote stats last sent
+        self._last_article_id = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, poll_fn):
+        """Build a hub from the environment, or None when streaming is off"""
+        env = os.environ.get
+        if env('STREAM_ENABLED', '0') != '1':
+            return None
+        return cls(
+            poll_fn,
+            poll_seconds=float(env('STREAM_POLL_SECONDS', 2)),
+            max_rate=float(env('STREAM_MAX_UPDATES_PER_SECOND', 2)),
+            heartbeat_seconds=float(env('STREAM_HEARTBEAT_SECONDS', 15)),
+            max_seconds=float(env('STREAM_MAX_SECONDS', 300)),
+            max_subscribers=int(env('STREAM_MAX_SUBSCRIBERS', 16)),
+            max_articles=int(env('STREAM_MAX_ARTICLES', 200)),
+        )
+
+    def subscribe(self, article_ids, categories):
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise StreamFull(retry_after=int(self.poll_seconds * 5))
+            subscription = Subscription(list(article_ids)[:self.max_articles], categories)
+            self._subscribers.add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def watched_articles(self):
+        with self._lock:
+            return set().union(*(s.article_ids for s in self._subscribers))
+
+    def publish_votes(self, article_id, vote_stats):
+        """Queue the article's current stats; sent on the next tick unless superseded"""
+        with self._lock:
+            if self._sent.get(article_id) != vote_stats:
+                self._dirty[article_id] = vote_stats
+
+    def publish_articles(self, counts):
+        """counts: {category: (new article count, newest id)}"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for category, (count, latest_id) in counts.items():
+            data = {'category': category, 'count': count, 'latest_id': latest_id}
+            for subscription in subscribers:
+                if subscription.wants_category(category):
+                    subscription.put('articles', category, data)
+
+    def _send_votes(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._sent.update(dirty)
+            subscribers = list(self._subscribers)
+            watched = set().union(*(s.article_ids for s in subscribers))
+            # Forget articles nobody watches any more
+            for article_id in list(self._sent):
+                if article_id not in watched:
+                    del self._sent[article_id]
+        for article_id, vote_stats in dirty.items():
+            data = {'article_id': article_id, 'vote_stats': vote_stats}
+            for subscription in subscribers:
+                if article_id in subscription.article_ids:
+                    subscription.put('votes', article_id, data)
+
+    def _poll(self):
+        watched = self.watched_articles()
+        vote_stats, new_articles, last_id = self.poll_fn(watched, self._last_article_id)
+        for article_id, stats in vote_stats.items():
+            self.publish_votes(article_id, stats)
+        if self._last_article_id is not None and new_articles:
+            self.publish_articles(new_articles)
+        self._last_article_id = last_id
+
+    def _run(self):
+        next_poll = 0.0
+        while not self._stop.wait(self.interval):
+            if not self._subscribers:
+                continue
+            if time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.poll_seconds
+                try:
+                    self._poll()
+                except Exception:
+                    logger.exception("Stream poll failed")
+            self._send_votes()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stream-hub', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+    def events(self, subscription, initial=()):
+        """The text/event-stream body for one subscription; unsubscribes when it ends"""
+        return EventStream(self, subscription, initial)
+
+
+class EventStream:
+    """The text/event-stream body of one subscription. A WSGI server iterates it
+    on a thread; asgi.py iterates it with `async for`. Either way it ends after
+    max_seconds or when the subscription is closed, and unsubscribes."""
+
+    def __init__(self, hub, subscription, initial=()):
+        self.hub = hub
+        self.subscription = subscription
+        self.initial = list(initial)
+        self.deadline = time.monotonic() + hub.max_seconds
+
+    def _open(self):
+        return not self.subscription.closed and time.monotonic() < self.deadline
+
+    def _timeout(self):
+        return min(self.hub.heartbeat_seconds, max(self.deadline - time.monotonic(), 0))
+
+    def _start(self):
+        # Reconnect after 3s if the connection drops
+        yield 'retry: 3000\n\n'
+        for event, data in self.initial:
+            yield format_event(event, data)
+
+    def _chunks(self, events):
+        if not events:
+            # Comment line: keeps proxies from timing the connection out
+            yield ': keepalive\n\n'
+        for event, data in events:
+            yield format_event(event, data)
+
+    def __iter__(self):
+        try:
+            yield from self._start()
+            while self._open():
+                yield from self._chunks(self.subscription.take(self._timeout()))
+        finally:
+            self.close()
+
+    async def __aiter__(self):
+        try:
+            for chunk in self._start():
+                yield chunk
+            while self._open():
+                for chunk in self._chunks(await self.subscription.take_async(self._timeout())):
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        self.hub.unsubscribe(self.subscription)
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
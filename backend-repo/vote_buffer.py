@@ -0,0 +1,130 @@
+"""
+vote_buffer.py
+Optional write-behind buffer for article votes.
+
+When VOTE_WRITE_BEHIND is enabled, vote_article records the vote here and
+returns immediately. A background thread flushes the buffer every
+VOTE_FLUSH_INTERVAL_MS milliseconds as one batched upsert, and repeated
+clicks by the same user on the same article are coalesced so only the
+latest choice is written.
+
+Durability: a vote acknowledged in this mode lives only in the worker's
+memory until the next flush. A graceful shutdown (atexit, SIGTERM under
+gunicorn) flushes what is left, but a crash or SIGKILL loses at most one
+flush interval of votes. Leave write-behind off where that is not
+acceptable. Each worker process has its own buffer, so if the same user
+votes on the same article through two workers within one interval, the
+worker that flushes last wins.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """In-process queue of pending votes, coalesced per (user, article)"""
+
+    def __init__(self, flush_fn, interval_ms=200, max_pending=5000):
+        self.flush_fn = flush_fn
+        self.interval = interval_ms / 1000.0
+        self.max_pending = max_pending
+        self._pending = {}          # article_id -> {user_id: (is_biased, voted_at)}
+        self._inflight = {}         # batch being written, still visible to readers
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, flush_fn):
+        """Build a buffer from the environment, or None when write-behind is off"""
+        if os.environ.get('VOTE_WRITE_BEHIND', '').strip().lower() not in ('1', 'true', 'yes', 'on'):
+            return None
+        return cls(
+            flush_fn,
+            interval_ms=int(os.environ.get('VOTE_FLUSH_INTERVAL_MS', 200)),
+            max_pending=int(os.environ.get('VOTE_BUFFER_MAX_PENDING', 5000)),
+        )
+
+    def add(self, user_id, article_id, is_biased):
+        """Queue a vote; flushes synchronously if the buffer is full"""
+        with self._lock:
+            votes = self._pending.setdefault(article_id, {})
+            if user_id not in votes:
+                self._count += 1
+            votes[user_id] = (is_biased, datetime.utcnow())
+            full = self._count >= self.max_pending
+        if full:
+            self.flush()
+
+    def pending_for_article(self, article_id):
+        """Returns {user_id: is_biased} for votes not yet written"""
+        with self._lock:
+            votes = {**self._inflight.get(article_id, {}), **self._pending.get(article_id, {})}
+        return {u: v[0] for u, v in votes.items()}
+
+    def pending_vote(self, user_id, article_id):
+        """The user's unflushed vote on the article, or None"""
+        with self._lock:
+            vote = self._pending.get(article_id, {}).get(user_id) or self._inflight.get(article_id, {}).get(user_id)
+        return vote[0] if vote else None
+
+    def pending_count(self):
+        return self._count
+
+    def flush(self):
+        """Write all pending votes; returns the number of votes flushed"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._count = self._pending, {}, 0
+                self._inflight = batch
+            if not batch:
+                return 0
+            rows = [
+                {'user_id': user_id, 'article_id': article_id, 'is_biased': is_biased, 'created_at': voted_at}
+                for article_id, votes in batch.items()
+                for user_id, (is_biased, voted_at) in votes.items()
+            ]
+            try:
+                self.flush_fn(rows)
+            except Exception:
+                logger.exception("Vote flush failed, re-queueing %d votes", len(rows))
+                self._requeue(batch)
+                return 0
+            finally:
+                with self._lock:
+                    self._inflight = {}
+            return len(rows)
+
+    def _requeue(self, batch):
+        with self._lock:
+            for article_id, votes in batch.items():
+                current = self._pending.setdefault(article_id, {})
+                for user_id, vote in votes.items():
+                    # A newer click that arrived during the flush wins
+                    if user_id not in current:
+                        current[user_id] = vote
+                        self._count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='vote-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush-on-shutdown hook: stop the flusher and write what is left"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.interval * 2, 1))
+        flushed = self.flush()
+        if flushed:
+            logger.info("Flushed %d pending votes on shutdown", flushed)
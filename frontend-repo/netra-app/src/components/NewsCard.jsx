@@ -207,7 +207,7 @@ import ThumbUpIcon from '@mui/icons-material/ThumbUp';
 import ThumbDownIcon from '@mui/icons-material/ThumbDown';
 import AccessTimeIcon from '@mui/icons-material/AccessTime';
 import { useNavigate } from 'react-router-dom';
-import { bookmarksAPI, authAPI } from '../service/api';
+import { bookmarksAPI, authAPI, imageUrl } from '../service/api';
 
 const NewsCard = ({ article, onBookmarkChange }) => {
   const navigate = useNavigate();
@@ -320,7 +320,7 @@ const NewsCard = ({ article, onBookmarkChange }) => {
           <CardMedia
             component="img"
             height="200"
-            image={article.featured_image}
+            image={imageUrl(article.featured_image_proxy, article.featured_image)}
             alt={article.headline || 'Article image'}
             onError={handleImageError}
             sx={{ objectFit: 'cover', backgroundColor: '#f0f0f0' }}
@@ -408,7 +408,7 @@ const NewsCard = ({ article, onBookmarkChange }) => {
           <Box sx={{ display: 'flex', alignItems: 'center', gap: 1, mb: 2, flexWrap: 'wrap' }}>
             {article.source_logo && (
               <img
-                src={article.source_logo}
+                src={imageUrl(article.source_logo_proxy, article.source_logo)}
                 alt={article.source_name}
                 style={{ width: 20, height: 20, objectFit: 'contain' }}
                 onError={(e) => e.target.style.display = 'none'}
@@ -9,7 +9,7 @@ import Filter from "../components/Filter";
 import YouTubeRecommendation from "../components/YouTube";
 import { Box, CircularProgress, Alert, Typography, Button } from "@mui/material";
 import { useNavigate } from 'react-router-dom';
-import { articlesAPI } from '../service/api';
+import { articlesAPI, streamAPI, FEED_FIELDS } from '../service/api';
 
 const theme = createTheme({
   palette: {
@@ -32,6 +32,7 @@ function Home(){
   const [articles, setArticles] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [newArticles, setNewArticles] = useState(0);
   const [pagination, setPagination] = useState({
     page: 1,
     per_page: 20,
@@ -42,6 +43,20 @@ function Home(){
     fetchArticles();
   }, [filters, pagination.page]);
 
+  // Live vote counts for the cards on screen, and a count of articles added since the page loaded
+  useEffect(() => {
+    if (articles.length === 0) return undefined;
+    return streamAPI.subscribe(
+      { articleIds: articles.map((a) => a.id), categories: filters.categories || [] },
+      {
+        onVotes: ({ article_id, vote_stats }) => setArticles((prev) => prev.map((a) => (
+          a.id === article_id ? { ...a, vote_stats } : a
+        ))),
+        onArticles: ({ count }) => setNewArticles((n) => n + count),
+      }
+    );
+  }, [articles.map((a) => a.id).join(','), filters.categories?.join(',')]);
+
   const fetchArticles = async () => {
     setLoading(true);
     setError(null);
@@ -51,6 +66,7 @@ function Home(){
         page: pagination.page,
         per_page: pagination.per_page,
         sort_by: 'recent',
+        fields: FEED_FIELDS,
       };
 
       // Handle Filters: Send strictly formatted params to backend
@@ -73,6 +89,7 @@ function Home(){
       const response = await articlesAPI.getArticles(params);
       
       setArticles(response.articles || []);
+      setNewArticles(0);
       setPagination(prev => ({
         ...prev,
         total_pages: response.pagination?.total_pages || 1,
@@ -123,6 +140,16 @@ function Home(){
               </Alert>
             )}
 
+            {newArticles > 0 && pagination.page === 1 && (
+              <Alert
+                severity="info"
+                sx={{ mb: 3 }}
+                action={<Button color="inherit" size="small" onClick={fetchArticles}>Show</Button>}
+              >
+                {newArticles} new {newArticles === 1 ? 'article' : 'articles'}
+              </Alert>
+            )}
+
             {loading ? (
               <Box sx={{ display: 'flex', justifyContent: 'center', mt: 8 }}>
                 <CircularProgress />
@@ -12,7 +12,7 @@ import SendIcon from '@mui/icons-material/Send';
 import AccessTimeIcon from '@mui/icons-material/AccessTime';
 import ThumbUpIcon from '@mui/icons-material/ThumbUp';
 import ThumbDownIcon from '@mui/icons-material/ThumbDown';
-import { articlesAPI, votingAPI, authAPI } from '../service/api';
+import { articlesAPI, votingAPI, authAPI, streamAPI, imageUrl } from '../service/api';
 
 const theme = createTheme({
   palette: {
@@ -46,6 +46,14 @@ const NewsPage = () => {
     }
   }, [id]);
 
+  // Other readers' votes, as they come in
+  useEffect(() => {
+    if (!id) return undefined;
+    return streamAPI.subscribe({ articleIds: [id] }, {
+      onVotes: ({ vote_stats }) => setArticle((prev) => (prev ? { ...prev, vote_stats } : prev)),
+    });
+  }, [id]);
+
   const fetchArticle = async () => {
     setLoading(true);
     setError(null);
@@ -145,7 +153,7 @@ const NewsPage = () => {
 
                     <Box sx={{ width: '100%', height: 350, my: 3, bgcolor: '#eee', borderRadius: 2, overflow: 'hidden' }}>
                       {article.featured_image && (
-                        <img src={article.featured_image} style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                        <img src={imageUrl(article.featured_image_proxy, article.featured_image)} style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                       )}
                     </Box>
 
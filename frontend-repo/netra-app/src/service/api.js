@@ -219,18 +219,121 @@ export const statsAPI = {
     return response.data;
   },
 
-  // Fetch all stats at once (for dashboard)
+  // Fetch all stats at once (for dashboard): one request, one set of queries
+  // { overview, voting, bookmarks, sources, categories, authors, engagement }
   getAllStats: async () => {
-    const [overview, voting, bookmarks, sources, categories, authors, engagement] = await Promise.all([
-      statsAPI.getOverview(),
-      statsAPI.getVotingStats(),
-      statsAPI.getBookmarkStats(),
-      statsAPI.getSourceStats(),
-      statsAPI.getCategoryStats(),
-      statsAPI.getAuthorStats(),
-      statsAPI.getEngagementStats(),
-    ]);
-    return { overview, voting, bookmarks, sources, categories, authors, engagement };
+    const response = await api.get('/stats/all');
+    return response.data;
+  },
+};
+
+// ==================== Sparse fieldsets ====================
+
+// The article fields a feed card renders, sent as ?fields= so the backend
+// skips everything else (and the per-article lookups behind it)
+export const FEED_FIELDS = [
+  'id', 'headline', 'author', 'category', 'featured_image', 'featured_image_proxy',
+  'source_logo', 'source_logo_proxy', 'source_name', 'publish_date', 'vote_stats', 'is_bookmarked',
+].join(',');
+
+// ==================== Images ====================
+
+// Absolute URL for a backend image path (featured_image_proxy / source_logo_proxy),
+// falling back to the original third-party URL when there is no cached copy
+export const imageUrl = (proxyPath, fallback) =>
+  proxyPath ? new URL(proxyPath, API_BASE_URL).href : fallback;
+
+// ==================== Live Updates ====================
+
+// The backend serves the stream only with STREAM_ENABLED=1; build with
+// VITE_STREAM_ENABLED=1 to match. A 404 (streaming off on the server) stops
+// further attempts for the rest of the session.
+const STREAM_ENABLED = import.meta.env.VITE_STREAM_ENABLED === '1';
+let streamUnavailable = false;
+
+// One server-sent event block ("event: ...\ndata: ...") as { event, data, retry }
+const parseEvent = (block) => {
+  let event = 'message';
+  let retry;
+  const data = [];
+  block.split('\n').forEach((line) => {
+    const colon = line.indexOf(':');
+    if (colon === 0) return; // comment: keepalive
+    const field = colon < 0 ? line : line.slice(0, colon);
+    const value = colon < 0 ? '' : line.slice(colon + 1).replace(/^ /, '');
+    if (field === 'event') event = value;
+    else if (field === 'data') data.push(value);
+    else if (field === 'retry' && /^\d+$/.test(value)) retry = Number(value);
+  });
+  return { event, data: data.join('\n'), retry };
+};
+
+// Opens the server-sent events stream for the given article ids and categories.
+// onVotes({article_id, vote_stats}) and onArticles({category, count, latest_id})
+// are called as updates arrive. Returns a function that closes the stream.
+// Read with fetch rather than EventSource, which gives up on a 503 without
+// exposing its Retry-After.
+export const streamAPI = {
+  subscribe: ({ articleIds = [], categories = [] }, { onVotes, onArticles } = {}) => {
+    if (!STREAM_ENABLED || streamUnavailable || typeof TextDecoder === 'undefined') return () => {};
+    const params = new URLSearchParams();
+    if (articleIds.length) params.set('articles', articleIds.join(','));
+    if (categories.length) params.set('categories', categories.join(','));
+    const url = `${API_BASE_URL}/stream?${params}`;
+    const handlers = { votes: onVotes, articles: onArticles };
+    const controller = new AbortController();
+    let retryMs = 3000;
+    let timer;
+
+    const retryLater = (ms) => {
+      if (!controller.signal.aborted) timer = setTimeout(connect, ms);
+    };
+
+    async function connect() {
+      try {
+        const response = await fetch(url, {
+          headers: { Accept: 'text/event-stream' },
+          cache: 'no-store',
+          signal: controller.signal,
+        });
+        if (response.status === 404) {
+          streamUnavailable = true;
+          return;
+        }
+        if (!response.ok) {
+          // 503: the server's streams are full (or it cannot stream); come back when it says
+          const seconds = Number(response.headers.get('Retry-After'));
+          retryLater((seconds > 0 ? seconds : 30) * 1000);
+          return;
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const blocks = buffer.split('\n\n');
+          buffer = blocks.pop();
+          blocks.forEach((block) => {
+            const { event, data, retry } = parseEvent(block);
+            if (retry !== undefined) retryMs = retry;
+            if (data && handlers[event]) handlers[event](JSON.parse(data));
+          });
+        }
+        // The server ends streams after STREAM_MAX_SECONDS: reconnect, as EventSource would
+        retryLater(retryMs);
+      } catch (err) {
+        // Dropped connection; aborted streams were closed on purpose
+        retryLater(retryMs);
+      }
+    }
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(timer);
+    };
   },
 };
 
@@ -5,6 +5,17 @@ import re
 from urllib.parse import urljoin
 
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+}
+
+
+def fetch_html(url: str):
+    """Download a page; raises on network errors."""
+    return requests.get(url, headers=HEADERS, timeout=10).text
+
+
 def scrape_article(url: str):
     """
     UNIVERSAL NEWS SCRAPER (Option B)
@@ -13,17 +24,22 @@ def scrape_article(url: str):
     Returns a JSON object (Python dict).
     """
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                      "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
-    }
-
     try:
-        html = requests.get(url, headers=headers, timeout=10).text
+        html = fetch_html(url)
     except Exception as e:
         return {"error": f"Cannot retrieve URL: {e}"}
 
-    soup = BeautifulSoup(html, "html.parser")
+    return parse_article(html, url)
+
+
+def parse_article(html: str, url: str, parser: str = "html.parser"):
+    """
+    Extraction half of scrape_article, with no network access.
+    `parser` is any BeautifulSoup tree builder: "html.parser", "lxml"
+    or "html5lib" (the last two need their packages installed).
+    """
+
+    soup = BeautifulSoup(html, parser)
 
     # -----------------------------------------------------
     # Helper functions
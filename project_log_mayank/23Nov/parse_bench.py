@@ -0,0 +1,173 @@
+"""
+Offline benchmark for the extraction half of news_scraper.py.
+
+Runs parse_article() over the saved pages in html_corpus/ with each
+BeautifulSoup parser (html.parser, lxml, html5lib) and reports pages/sec,
+peak memory per page, and per-field hit rates. A hit means the field was
+found at all. Accuracy compares the field with the value recorded in
+html_corpus/expected.json.
+
+    python parse_bench.py
+    python parse_bench.py --parsers html.parser,lxml --repeat 50
+
+Add real pages to the corpus (saved as-is, with their URL recorded in
+expected.json so relative links resolve the same way):
+
+    python parse_bench.py --fetch urls.txt
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup, FeatureNotFound
+
+from news_scraper import fetch_html, parse_article
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html_corpus")
+PARSERS = ["html.parser", "lxml", "html5lib"]
+FIELDS = ["headline", "image", "author", "published", "content"]
+
+
+def load_corpus(corpus_dir):
+    with open(os.path.join(corpus_dir, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(corpus_dir, name), encoding="utf-8", errors="replace") as f:
+                html = f.read()
+            info = expected.get(name, {})
+            pages.append((name, html, info.get("url", "https://example.com/" + name), info))
+    return pages
+
+
+def normalize(value):
+    return re.sub(r"\s+", " ", str(value)).strip() if value else None
+
+
+def field_correct(field, got, want):
+    """None in expected.json means the page has no such field; content must contain the expected snippet"""
+    got = normalize(got)
+    if want is None:
+        return got is None
+    if field == "content":
+        return got is not None and normalize(want) in got
+    return got == normalize(want)
+
+
+def parser_available(parser):
+    try:
+        BeautifulSoup("<p></p>", parser)
+        return True
+    except FeatureNotFound:
+        return False
+
+
+def bench_parser(parser, pages, repeat):
+    # Speed: whole corpus, several times
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for _name, html, url, _info in pages:
+            parse_article(html, url, parser)
+    elapsed = time.perf_counter() - started
+
+    # Memory and quality: one traced pass per page
+    hits = dict.fromkeys(FIELDS, 0)
+    correct = dict.fromkeys(FIELDS, 0)
+    checked = dict.fromkeys(FIELDS, 0)
+    peaks = []
+    misses = []
+    for name, html, url, info in pages:
+        tracemalloc.start()
+        result = parse_article(html, url, parser)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        for field in FIELDS:
+            if result.get(field):
+                hits[field] += 1
+            if field in info:
+                checked[field] += 1
+                if field_correct(field, result.get(field), info[field]):
+                    correct[field] += 1
+                else:
+                    misses.append(f"{name}:{field}")
+
+    total_pages = len(pages) * repeat
+    return {
+        "pages_per_sec": round(total_pages / elapsed, 1) if elapsed else 0,
+        "ms_per_page": round(elapsed * 1000 / total_pages, 3) if total_pages else 0,
+        "mean_peak_kb_per_page": round(sum(peaks) / len(peaks) / 1024, 1) if peaks else 0,
+        "max_peak_kb_per_page": round(max(peaks) / 1024, 1) if peaks else 0,
+        "hit_rate": {f: round(hits[f] / len(pages), 2) for f in FIELDS},
+        "accuracy": {f: round(correct[f] / checked[f], 2) if checked[f] else None for f in FIELDS},
+        "misses": misses,
+    }
+
+
+def fetch_pages(url_file, corpus_dir):
+    """Save each URL in url_file into the corpus and record it in expected.json"""
+    with open(os.path.join(corpus_dir, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    with open(url_file) as f:
+        urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    for url in urls:
+        slug = re.sub(r"[^a-z0-9]+", "_", url.lower().split("://", 1)[-1]).strip("_")[:80]
+        name = f"{slug}.html"
+        try:
+            html = fetch_html(url)
+        except Exception as e:
+            print(f"  failed {url}: {e}")
+            continue
+        with open(os.path.join(corpus_dir, name), "w", encoding="utf-8") as f:
+            f.write(html)
+        # Only the URL is known; add expected field values by hand to score accuracy
+        expected.setdefault(name, {"url": url})
+        print(f"  saved {name} ({len(html) // 1024} KB)")
+    with open(os.path.join(corpus_dir, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump(expected, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark news_scraper.parse_article over saved HTML pages")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="directory of .html pages and expected.json")
+    parser.add_argument("--parsers", default=",".join(PARSERS), help="comma separated BeautifulSoup parsers")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the corpus for the timing")
+    parser.add_argument("--fetch", metavar="URL_FILE", help="download the URLs listed in URL_FILE into the corpus and exit")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.fetch, args.corpus)
+        return
+
+    pages = load_corpus(args.corpus)
+    size_kb = sum(len(html.encode("utf-8")) for _, html, _, _ in pages) / 1024
+    print(f"Corpus: {len(pages)} pages, {size_kb:.0f} KB, {args.repeat} passes\n")
+
+    results = {}
+    for name in [p.strip() for p in args.parsers.split(",")]:
+        if not parser_available(name):
+            print(f"{name}: not installed, skipping (pip install {name})\n")
+            continue
+        results[name] = r = bench_parser(name, pages, args.repeat)
+        print(f"{name}: {r['pages_per_sec']} pages/sec ({r['ms_per_page']} ms/page), "
+              f"peak {r['mean_peak_kb_per_page']} KB/page (max {r['max_peak_kb_per_page']} KB)")
+        print("  " + "  ".join(f"{f:>9s}" for f in ["field"] + FIELDS))
+        print("  " + "  ".join(f"{v:>9}" for v in ["hit"] + [r["hit_rate"][f] for f in FIELDS]))
+        print("  " + "  ".join(f"{str(v):>9}" for v in ["accuracy"] + [r["accuracy"][f] for f in FIELDS]))
+        if r["misses"]:
+            print("  wrong or missing: " + ", ".join(r["misses"]))
+        print()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"pages": len(pages), "repeat": args.repeat, "parsers": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()